@@ -0,0 +1,66 @@
+"""Migrates an existing database from the duplicate image trigger to the
+``images.dedupe_key`` column: adds and backfills the column, makes it unique
+and drops the trigger together with the unique constraint on the raw bbox.
+
+New images are keyed by the bbox of the Sentinel Hub request. Existing rows
+only store the raster bbox, which covers the same area, so they are keyed by
+that; the rounding in ``image_dedupe_key`` absorbs reprojection noise.
+
+    python -m scripts.add_image_dedupe_key
+"""
+
+from geoalchemy2.shape import to_shape
+from sqlalchemy import create_engine, text
+
+from src.config import DATABASE_URL
+from src.database.models import Image, image_dedupe_key
+
+if __name__ == "__main__":
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        print("Dropping trigger")
+        conn.execute(
+            text("DROP TRIGGER IF EXISTS prevent_duplicate_image_insert ON images")
+        )
+        conn.execute(text("DROP FUNCTION IF EXISTS prevent_duplicate_image_insert()"))
+        conn.execute(
+            text(
+                "ALTER TABLE images DROP CONSTRAINT IF EXISTS "
+                "images_image_id_timestamp_bbox_job_id_key"
+            )
+        )
+
+        print("Backfilling dedupe keys")
+        conn.execute(
+            text("ALTER TABLE images ADD COLUMN IF NOT EXISTS dedupe_key varchar(64)")
+        )
+        rows = conn.execute(
+            Image.__table__.select()
+            .with_only_columns(
+                Image.id, Image.image_id, Image.timestamp, Image.bbox, Image.job_id
+            )
+            .where(Image.dedupe_key.is_(None))
+        )
+        keys = [
+            {
+                "id": row.id,
+                "dedupe_key": image_dedupe_key(
+                    row.image_id, row.timestamp, to_shape(row.bbox), row.job_id
+                ),
+            }
+            for row in rows
+        ]
+        if keys:
+            conn.execute(
+                text("UPDATE images SET dedupe_key = :dedupe_key WHERE id = :id"), keys
+            )
+        print(f"Backfilled {len(keys)} images")
+
+        conn.execute(text("ALTER TABLE images ALTER COLUMN dedupe_key SET NOT NULL"))
+        conn.execute(
+            text(
+                "ALTER TABLE images ADD CONSTRAINT images_dedupe_key_key "
+                "UNIQUE (dedupe_key)"
+            )
+        )
+    engine.dispose()
@@ -0,0 +1,45 @@
+"""Migrates an existing database to the ``prediction_vectors.job_id`` and
+``prediction_vectors.image_timestamp`` columns: adds them, backfills them from
+the image each prediction raster belongs to and makes them NOT NULL.
+
+The table stays unpartitioned, ``PREDICTION_VECTOR_PARTITIONING`` only
+applies to tables created by ``create_tables``.
+
+    python -m scripts.add_prediction_vector_job_columns
+"""
+
+from sqlalchemy import create_engine, text
+
+from src.config import DATABASE_URL
+
+if __name__ == "__main__":
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        print("Adding columns")
+        conn.execute(
+            text(
+                "ALTER TABLE prediction_vectors "
+                "ADD COLUMN IF NOT EXISTS job_id integer, "
+                "ADD COLUMN IF NOT EXISTS image_timestamp timestamp without time zone"
+            )
+        )
+
+        print("Backfilling job ids and image timestamps")
+        result = conn.execute(text("""
+                UPDATE prediction_vectors v
+                SET job_id = i.job_id, image_timestamp = i.timestamp
+                FROM prediction_rasters r
+                JOIN images i ON i.id = r.image_id
+                WHERE r.id = v.prediction_raster_id
+                AND (v.job_id IS NULL OR v.image_timestamp IS NULL)
+                """))
+        print(f"Backfilled {result.rowcount} prediction vectors")
+
+        conn.execute(
+            text(
+                "ALTER TABLE prediction_vectors "
+                "ALTER COLUMN job_id SET NOT NULL, "
+                "ALTER COLUMN image_timestamp SET NOT NULL"
+            )
+        )
+    engine.dispose()
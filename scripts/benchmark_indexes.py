@@ -0,0 +1,199 @@
+"""Records EXPLAIN ANALYZE timings of the service's lookup queries on a
+synthetic dataset, once without and once with the managed index set. The
+unique ``images.dedupe_key`` is a constraint and is in place for both runs.
+
+Runs against a scratch database that is dropped and recreated:
+
+    python -m scripts.benchmark_indexes --db-name oew_benchmark --images 20000
+"""
+
+import datetime
+import hashlib
+import json
+
+import click
+from sqlalchemy import create_engine, text
+from sqlalchemy_utils import create_database, database_exists, drop_database
+
+from src import config
+from src.database.create import create_indexes
+from src.database.models import Base
+
+QUERIES = {
+    # excluding the processed scenes of a job before downloading
+    "images_in_db": """
+        SELECT images.dedupe_key FROM images
+        WHERE images.dedupe_key = ANY(:dedupe_keys)
+    """,
+    # fetching the stored image after its insert conflicted
+    "image_by_dedupe_key": """
+        SELECT images.id FROM images
+        WHERE images.dedupe_key = :dedupe_key
+    """,
+    "scl_images_without_vectors": """
+        SELECT images.id FROM images
+        JOIN satellites ON images.satellite_id = satellites.id
+        LEFT OUTER JOIN scene_classification_vectors
+            ON images.id = scene_classification_vectors.image_id
+        WHERE scene_classification_vectors.id IS NULL
+        AND satellites.name = 'SENTINEL2_L2A'
+    """,
+    "images_in_time_range": """
+        SELECT count(*) FROM images
+        WHERE images.timestamp BETWEEN TIMESTAMP '2020-01-02'
+        AND TIMESTAMP '2020-01-03'
+    """,
+    "prediction_vectors_in_bbox": """
+        SELECT count(*) FROM prediction_vectors
+        WHERE ST_Intersects(
+            prediction_vectors.geometry, ST_MakeEnvelope(10, 10, 10.5, 10.5, 4326)
+        )
+    """,
+}
+
+
+def _seed(engine, n_images: int, n_jobs: int, vectors_per_image: int):
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO satellites (id, name) VALUES (1, 'SENTINEL2_L2A')")
+        )
+        conn.execute(text("""
+                INSERT INTO models (id, model_id, model_url, created_at, version,
+                    expected_image_height, expected_image_width, type, output_dtype)
+                VALUES (1, 'benchmark', 'benchmark', now(), 1, 480, 480,
+                    'SEGMENTATION', 'uint8')
+                """))
+        conn.execute(text("""
+                INSERT INTO aois (id, name, created_at, geometry)
+                VALUES (1, 'benchmark', now(), ST_MakeEnvelope(0, 0, 90, 45, 4326))
+                """))
+        conn.execute(
+            text("""
+                INSERT INTO jobs (id, status, created_at, start_date, end_date,
+                    maxcc, aoi_id, model_id)
+                SELECT g, 'COMPLETED', now(), now(), now(), 0.1, 1, 1
+                FROM generate_series(1, :jobs) g
+                """),
+            {"jobs": n_jobs},
+        )
+        conn.execute(
+            text("""
+                INSERT INTO images (id, satellite_id, image_id, image_url,
+                    timestamp, dtype, crs, resolution, image_width,
+                    image_height, bbox, job_id, dedupe_key)
+                SELECT g, 1, 'S2_' || g, 's3://benchmark/' || g,
+                    TIMESTAMP '2020-01-01' + g * INTERVAL '1 hour', 'uint8',
+                    4326, 10, 480, 480,
+                    ST_MakeEnvelope(g % 1800 * 0.05, g / 1800 % 900 * 0.05,
+                        g % 1800 * 0.05 + 0.05, g / 1800 % 900 * 0.05 + 0.05,
+                        4326),
+                    g % :jobs + 1,
+                    encode(sha256(('S2_' || g)::bytea), 'hex')
+                FROM generate_series(1, :images) g
+                """),
+            {"images": n_images, "jobs": n_jobs},
+        )
+        conn.execute(text("""
+                INSERT INTO prediction_rasters (id, raster_url, dtype,
+                    image_width, image_height, bbox, image_id)
+                SELECT id, image_url, dtype, image_width, image_height, bbox, id
+                FROM images
+                """))
+        conn.execute(
+            text("""
+                INSERT INTO prediction_vectors (pixel_value, geometry,
+                    prediction_raster_id, job_id, image_timestamp)
+                SELECT (v * 7) % 255,
+                    ST_SetSRID(ST_MakePoint(ST_XMin(r.bbox) + random() * 0.05,
+                        ST_YMin(r.bbox) + random() * 0.05), 4326),
+                    r.id, i.job_id, i.timestamp
+                FROM prediction_rasters r
+                JOIN images i ON i.id = r.image_id,
+                generate_series(1, :vectors) v
+                """),
+            {"vectors": vectors_per_image},
+        )
+        # every other image has SCL polygons
+        conn.execute(text("""
+                INSERT INTO scene_classification_vectors (pixel_value, geometry,
+                    image_id)
+                SELECT v, bbox, id
+                FROM images, generate_series(1, 4) v
+                WHERE id % 2 = 0
+                """))
+        conn.execute(text("ANALYZE"))
+
+
+def _drop_indexes(engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("ANALYZE"))
+
+
+def _explain(engine, query: str, params: dict) -> float:
+    with engine.connect() as conn:
+        plan = conn.execute(
+            text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"), params
+        ).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"]
+
+
+def _run_queries(engine, params: dict, repeat: int) -> dict[str, float]:
+    return {
+        name: min(_explain(engine, query, params) for _ in range(repeat))
+        for name, query in QUERIES.items()
+    }
+
+
+@click.command()
+@click.option("--db-name", default="oew_benchmark", show_default=True)
+@click.option("--images", "n_images", default=20_000, show_default=True)
+@click.option("--jobs", "n_jobs", default=50, show_default=True)
+@click.option("--vectors-per-image", default=50, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+def main(db_name: str, n_images: int, n_jobs: int, vectors_per_image: int, repeat: int):
+    url = (
+        f"postgresql+psycopg2://{config.DB_USER}:{config.DB_PW}@"
+        f"{config.DB_HOST}:{config.DB_PORT}/{db_name}"
+    )
+    engine = create_engine(url)
+    if database_exists(engine.url):
+        drop_database(engine.url)
+    create_database(engine.url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION postgis"))
+    Base.metadata.create_all(engine)
+
+    started = datetime.datetime.now()
+    _seed(engine, n_images, n_jobs, vectors_per_image)
+    print(f"Seeded {n_images} images in {datetime.datetime.now() - started}")
+
+    # lookup of an image that exists, with the values _seed gave it
+    g = n_images // 2
+    params = {
+        "dedupe_key": hashlib.sha256(f"S2_{g}".encode()).hexdigest(),
+        "dedupe_keys": [
+            hashlib.sha256(f"S2_{i}".encode()).hexdigest() for i in range(g, g + 50)
+        ],
+    }
+    _drop_indexes(engine)
+    without = _run_queries(engine, params, repeat)
+    create_indexes(engine, Base)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    with_indexes = _run_queries(engine, params, repeat)
+
+    print(f"{'query':<30}{'no indexes (ms)':>18}{'indexes (ms)':>15}")
+    for name in QUERIES:
+        print(f"{name:<30}{without[name]:>18.2f}{with_indexes[name]:>15.2f}")
+
+    engine.dispose()
+    drop_database(engine.url)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy_utils import drop_database
 
-from src.config import DATABASE_URL
+from src.config import DATABASE_URL, PREDICTION_VECTOR_PARTITIONING
 from src.database.create import create_postgis_db, create_tables
 from src.database.models import Base
-from src.database.triggers import create_triggers
 
 if __name__ == "__main__":
     engine = create_engine(DATABASE_URL)
@@ -13,6 +12,4 @@ if __name__ == "__main__":
     print("Creating database")
     create_postgis_db(engine)
     print("Creating tables")
-    create_tables(engine, Base)
-    print("Creating triggers")
-    create_triggers()
+    create_tables(engine, Base, PREDICTION_VECTOR_PARTITIONING)
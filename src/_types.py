@@ -1,3 +1,4 @@
+import datetime
 from typing import NamedTuple
 
 IMAGE_DTYPES = [
@@ -29,3 +30,10 @@ class TimeRange(NamedTuple):
 class HeightWidth(NamedTuple):
     height: int
     width: int
+
+
+class SceneKey(NamedTuple):
+    image_id: str
+    timestamp: datetime.datetime
+    bbox: BoundingBox
+    crs: int
@@ -1,11 +1,73 @@
+import atexit
 import io
 import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 
+from src.config import (
+    S3_MAX_CONCURRENCY,
+    S3_MULTIPART_CHUNKSIZE,
+    S3_MULTIPART_THRESHOLD,
+    S3_UPLOAD_WORKERS,
+)
+
 LOGGER = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+)
+
+# the process-wide client and upload executor, created on first use
+_state: dict[str, Any] = {"client": None, "executor": None}
+_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide S3 client. Its connection pool is sized for
+    every background upload running a multipart transfer at once."""
+    if _state["client"] is None:
+        with _lock:
+            if _state["client"] is None:
+                _state["client"] = boto3.client(
+                    "s3",
+                    config=Config(
+                        max_pool_connections=S3_UPLOAD_WORKERS * S3_MAX_CONCURRENCY
+                    ),
+                )
+    return _state["client"]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    if _state["executor"] is None:
+        with _lock:
+            if _state["executor"] is None:
+                _state["executor"] = ThreadPoolExecutor(
+                    max_workers=S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload"
+                )
+    return _state["executor"]
+
+
+def shutdown_uploads():
+    """Wait for the submitted uploads to finish and stop the upload threads."""
+    with _lock:
+        if _state["executor"] is not None:
+            _state["executor"].shutdown(wait=True)
+        _state["executor"] = None
+
+
+atexit.register(shutdown_uploads)
+
 
 def stream_to_s3(
     data_stream: io.BytesIO,
@@ -13,9 +75,10 @@ def stream_to_s3(
     object_name: str,
 ) -> str:
     """Uploads a file to an S3 bucket and returns the URL to the uploaded file"""
-    s3 = boto3.client("s3")
     try:
-        s3.upload_fileobj(data_stream, bucket_name, object_name)
+        get_client().upload_fileobj(
+            data_stream, bucket_name, object_name, Config=TRANSFER_CONFIG
+        )
         LOGGER.info("File uploaded to s3://%s/%s", bucket_name, object_name)
         return f"s3://{bucket_name}/{object_name}"
     except NoCredentialsError as e:
@@ -26,14 +89,29 @@ def stream_to_s3(
         raise e
 
 
+def stream_to_s3_async(
+    data_stream: io.BytesIO,
+    bucket_name: str,
+    object_name: str,
+) -> Future[str]:
+    """Uploads a file to an S3 bucket in a background thread and returns a
+    future of the URL to the uploaded file"""
+    return submit(stream_to_s3, data_stream, bucket_name, object_name)
+
+
+def submit(fn: Callable[..., T], *args, **kwargs) -> Future[T]:
+    """Run ``fn`` on the upload threads, e.g. to encode a file before it is
+    uploaded without blocking the caller."""
+    return _get_executor().submit(fn, *args, **kwargs)
+
+
 def download_from_s3(
     bucket_name: str,
     object_name: str,
 ) -> bytes:
     """Downloads a file from an S3 bucket and returns the file content"""
-    s3 = boto3.client("s3")
     try:
-        response = s3.get_object(Bucket=bucket_name, Key=object_name)
+        response = get_client().get_object(Bucket=bucket_name, Key=object_name)
         LOGGER.info("File downloaded from s3://%s/%s", bucket_name, object_name)
         return response["Body"].read()
     except NoCredentialsError as e:
@@ -48,8 +126,7 @@ def get_folder_contents(
     bucket_name: str,
     folder_name: str,
 ):
-    s3 = boto3.client("s3")
-    paginator = s3.get_paginator("list_objects_v2")
+    paginator = get_client().get_paginator("list_objects_v2")
     for page in paginator.paginate(Bucket=bucket_name, Prefix=folder_name):
         for obj in page.get("Contents", []):
             key = obj["Key"]
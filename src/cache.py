@@ -0,0 +1,169 @@
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from src.aws import s3
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheStats:
+    disk_hits: int = 0
+    s3_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.disk_hits + self.s3_hits
+
+
+class DiskCache:
+    """Stores values, e.g. predictions or Sentinel Hub responses, as files
+    named by their key and evicts the least recently used ones once the
+    directory grows beyond ``max_bytes``."""
+
+    def __init__(self, directory: str, max_bytes: int = 5 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+        # puts come from several download threads
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            return None
+        # the file may have been evicted by another thread since it was read
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return value
+
+    def put(self, key: str, value: bytes):
+        path = os.path.join(self.directory, key)
+        if os.path.exists(path):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(value)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list[os.DirEntry]:
+        return [
+            entry
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        ]
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            LOGGER.debug(f"Evicted {entry.name} from disk cache")
+
+
+class S3Cache:
+    """Stores values as objects under ``prefix`` in ``bucket_name``."""
+
+    def __init__(self, bucket_name: str, prefix: str = "inference-cache"):
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip("/")
+
+    @property
+    def client(self):
+        return s3.get_client()
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket_name, Key=f"{self.prefix}/{key}"
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def put(self, key: str, value: bytes):
+        self.client.put_object(
+            Bucket=self.bucket_name, Key=f"{self.prefix}/{key}", Body=value
+        )
+
+
+class TieredCache:
+    """Looks values up on disk first, then in the optional S3 tier, whose
+    hits are copied to disk. Values are stored in every tier."""
+
+    def __init__(
+        self,
+        disk_cache: Optional[DiskCache] = None,
+        s3_cache: Optional[S3Cache] = None,
+    ):
+        self.disk_cache = disk_cache
+        self.s3_cache = s3_cache
+        self.stats = CacheStats()
+        # gets come from the download threads and the inference workers
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.disk_cache is not None:
+            value = self.disk_cache.get(key)
+            if value is not None:
+                with self._stats_lock:
+                    self.stats.disk_hits += 1
+                return value
+        if self.s3_cache is not None:
+            value = self.s3_cache.get(key)
+            if value is not None:
+                with self._stats_lock:
+                    self.stats.s3_hits += 1
+                if self.disk_cache is not None:
+                    self.disk_cache.put(key, value)
+                return value
+        with self._stats_lock:
+            self.stats.misses += 1
+        return None
+
+    def put(self, key: str, value: bytes):
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, value)
+        if self.s3_cache is not None:
+            self.s3_cache.put(key, value)
+
+
+def create_tiered_cache(
+    directory: Optional[str],
+    max_bytes: int,
+    bucket_name: str,
+    s3_prefix: Optional[str],
+) -> Optional[TieredCache]:
+    """Cache with a disk tier under ``directory`` and an S3 tier under
+    ``s3_prefix``, each only if configured. None if neither is."""
+    if directory is None and s3_prefix is None:
+        return None
+    return TieredCache(
+        disk_cache=DiskCache(directory, max_bytes) if directory else None,
+        s3_cache=S3Cache(bucket_name, s3_prefix) if s3_prefix else None,
+    )
@@ -14,9 +14,44 @@ DB_PW = os.environ["DB_PW"]
 DB_NAME = os.environ["DB_NAME"]
 DB_HOST = os.environ["DB_HOST"]
 DB_PORT = os.environ["DB_PORT"]
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PW}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PW}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# "job" or "month" to partition prediction_vectors, unset for a plain table
+PREDICTION_VECTOR_PARTITIONING = os.getenv("PREDICTION_VECTOR_PARTITIONING") or None
 
 RUNPOD_API_KEY = os.environ["RUNPOD_API_KEY"]
+INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "8"))
+INFERENCE_CACHE_DIR = os.getenv("INFERENCE_CACHE_DIR")
+INFERENCE_CACHE_MAX_BYTES = int(
+    os.getenv("INFERENCE_CACHE_MAX_BYTES", str(5 * 1024**3))
+)
+INFERENCE_CACHE_S3_PREFIX = os.getenv("INFERENCE_CACHE_S3_PREFIX")
+# tiles without water in the Natural Earth ocean polygons are not inferred.
+# The ocean polygons leave out rivers, lakes and most estuaries. Off by
+# default as the .shp of the polygons is not part of the repository
+SKIP_LAND_TILES = os.getenv("SKIP_LAND_TILES", "false").lower() == "true"
+WATER_MASK_PATH = os.getenv("WATER_MASK_PATH", "assets/ne_10m_ocean/ne_10m_ocean.shp")
+# in units of the scene's CRS, metres for the UTM scenes of Sentinel Hub
+WATER_MASK_BUFFER = float(os.getenv("WATER_MASK_BUFFER", "500"))
+# L2A tiles mostly covered by clouds or no data are not inferred. SCL is
+# requested as an extra band, so these downloads are cached under other keys
+# than the same scenes without it, the uploaded image does not contain it.
+# Off by default as skipped tiles change the predictions of a job
+SKIP_CLOUDY_TILES = os.getenv("SKIP_CLOUDY_TILES", "false").lower() == "true"
+MAX_INVALID_TILE_FRACTION = float(os.getenv("MAX_INVALID_TILE_FRACTION", "0.9"))
+# points are vectorized on the UTM prediction and transformed to EPSG:4326,
+# the prediction raster is warped on the upload threads
+VECTORIZE_NATIVE_CRS = os.getenv("VECTORIZE_NATIVE_CRS", "true").lower() == "true"
+SH_DOWNLOAD_WORKERS = int(os.getenv("SH_DOWNLOAD_WORKERS", "4"))
+# scenes downloaded ahead of the one being processed
+PREFETCH_SCENES = int(os.getenv("PREFETCH_SCENES", "2"))
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(2 * 1024**3)))
+SH_CACHE_DIR = os.getenv("SH_CACHE_DIR")
+SH_CACHE_MAX_BYTES = int(os.getenv("SH_CACHE_MAX_BYTES", str(20 * 1024**3)))
+SH_CACHE_S3_PREFIX = os.getenv("SH_CACHE_S3_PREFIX")
 
 
 SH_CONFIG = SHConfig(
@@ -26,6 +61,14 @@ SH_CONFIG = SHConfig(
 )
 
 S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(16 * 1024**2)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(16 * 1024**2)))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "10"))
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "4"))
+# store images and prediction rasters as cloud-optimized GeoTIFFs
+COG_OUTPUT = os.getenv("COG_OUTPUT", "true").lower() == "true"
+COG_COMPRESSION = os.getenv("COG_COMPRESSION", "ZSTD")
+COG_BLOCKSIZE = int(os.getenv("COG_BLOCKSIZE", "512"))
 
 L1CBANDS = [
     "B1",
@@ -1,8 +1,22 @@
-from sqlalchemy import create_engine
+import atexit
+import threading
+from typing import Any
+
+from sqlalchemy import Engine, create_engine
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session, sessionmaker
 
-from src.config import DATABASE_URL
+from src.config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+)
+
+# the process-wide engine and its session factory, created on first use
+_state: dict[str, Any] = {"engine": None, "session_factory": None}
+_lock = threading.Lock()
 
 
 class DatabaseError(Exception):
@@ -10,10 +24,42 @@ class DatabaseError(Exception):
         super().__init__(message)
 
 
+def get_engine() -> Engine:
+    """Return the process-wide engine, creating it and its connection pool on
+    first use. The pool is disposed when the interpreter exits."""
+    if _state["engine"] is None:
+        with _lock:
+            if _state["engine"] is None:
+                engine = create_engine(
+                    DATABASE_URL,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                    pool_recycle=DB_POOL_RECYCLE,
+                )
+                _state["session_factory"] = sessionmaker(bind=engine)
+                _state["engine"] = engine
+    return _state["engine"]
+
+
+def get_session_factory() -> sessionmaker:
+    get_engine()
+    return _state["session_factory"]  # type: ignore
+
+
 def create_db_session() -> Session:
-    engine = create_engine(DATABASE_URL)
-    session = sessionmaker(bind=engine)
-    return session()
+    return get_session_factory()()
+
+
+def dispose_engine():
+    """Close all pooled connections, the next session creates a new engine."""
+    with _lock:
+        if _state["engine"] is not None:
+            _state["engine"].dispose()
+        _state["engine"], _state["session_factory"] = None, None
+
+
+atexit.register(dispose_engine)
 
 
 def _execute_query(session, query):
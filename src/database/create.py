@@ -1,9 +1,14 @@
 import os
+from typing import Optional
 
 import psycopg2
-from sqlalchemy import inspect
+from sqlalchemy import inspect, text
 from sqlalchemy_utils import create_database
 
+from src.database.partition import partitioned_table_ddl
+
+PARTITIONED_TABLES = ("prediction_vectors",)
+
 
 def create_postgis_db(engine):
     create_database(url=engine.url)
@@ -27,9 +32,35 @@ def check_tables_exists(engine):
         print(_t)
 
 
-def create_tables(engine, base):
+def create_indexes(engine, base):
+    """Create the indexes declared on the models that are missing, including
+    the GiST indexes GeoAlchemy2 adds for geometry columns, so existing
+    databases pick up new indexes without recreating their tables."""
+    for table in base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+            print(f"Index {index.name} on {table.name}")
+
+
+def create_tables(engine, base, partition_by: Optional[str] = None):
+    """Recreate all tables. With ``partition_by`` set to ``"job"`` or
+    ``"month"`` the tables in ``PARTITIONED_TABLES`` are created as
+    partitioned tables, their partitions are created by ``Insert``."""
     base.metadata.drop_all(engine)
-    base.metadata.create_all(engine)
+    if partition_by is None:
+        base.metadata.create_all(engine)
+    else:
+        partitioned = [base.metadata.tables[name] for name in PARTITIONED_TABLES]
+        base.metadata.create_all(
+            engine,
+            tables=[t for t in base.metadata.sorted_tables if t not in partitioned],
+        )
+        with engine.begin() as conn:
+            for table in partitioned:
+                conn.execute(
+                    text(partitioned_table_ddl(table, partition_by, engine.dialect))
+                )
+    create_indexes(engine, base)
 
     check_tables_exists(engine)
     engine.dispose()
@@ -1,14 +1,27 @@
+import datetime
 import io
+import itertools
 import logging
-from typing import Iterable, Optional
+from concurrent.futures import Future
+from typing import (
+    Callable,
+    Generator,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
 
 from geoalchemy2 import WKBElement
 from geoalchemy2.shape import from_shape
 from shapely.geometry import box
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.orm import Session
 
 from src import config
+from src._types import SceneKey
 from src.aws import s3
 from src.database.models import (
     Image,
@@ -17,16 +30,36 @@ from src.database.models import (
     PredictionRaster,
     PredictionVector,
     SceneClassificationVector,
+    image_dedupe_key,
 )
+from src.database.partition import JOB, create_partition, drop_partition
 from src.geo_utils import reproject_geometry
-from src.models import DownloadResponse, Raster, Vector
+from src.models import DownloadResponse, Raster, Vector, VectorBatch
+from src.raster_op.utils import to_cog, write_cog
 
 LOGGER = logging.getLogger(__name__)
 
+COPY_CHUNK_SIZE = 100_000
+
+
+class InsertCounts(NamedTuple):
+    inserted: int
+    skipped: int
+
+
+class ImageInsert(NamedTuple):
+    image: Image
+    inserted: bool
+
 
 class Insert:
-    def __init__(self, session: Session):
+    def __init__(
+        self,
+        session: Session,
+        partition_by: Optional[str] = config.PREDICTION_VECTOR_PARTITIONING,
+    ):
         self.session = session
+        self.partition_by = partition_by
 
     def insert_image(
         self,
@@ -35,7 +68,9 @@ class Insert:
         image_url: str,
         job_id: int,
         satellite_id: int,
-    ) -> Image:
+    ) -> ImageInsert:
+        """Insert the image of a scene. When the scene is already stored for
+        the job, the stored image is returned with ``inserted`` False."""
         target_crs = 4326
         transformed_geometry = reproject_geometry(
             raster.geometry, raster.crs, target_crs
@@ -52,10 +87,34 @@ class Insert:
             image_height=raster.size[1],
             bbox=from_shape(transformed_geometry, srid=target_crs),
             job_id=job_id,
+            dedupe_key=scene_dedupe_key(scene_key(download_response), job_id),
         )
-        self.session.add(image)
+        if not self._is_postgresql():
+            # a duplicate violates the unique dedupe key
+            self.session.add(image)
+            self.session.commit()
+            return ImageInsert(image, True)
+
+        columns = {
+            column.key: getattr(image, column.key)
+            for column in Image.__table__.columns
+            if column.key != "id"
+        }
+        stmt = (
+            postgresql.insert(Image)
+            .values(**columns)
+            .on_conflict_do_nothing(index_elements=[Image.dedupe_key])
+            .returning(Image.id)
+        )
+        image_pk = self.session.execute(stmt).scalar_one_or_none()
         self.session.commit()
-        return image
+        if image_pk is None:
+            LOGGER.info(f"Image {download_response.image_id} already exists")
+            return ImageInsert(
+                self.session.query(Image).filter_by(dedupe_key=image.dedupe_key).one(),
+                False,
+            )
+        return ImageInsert(self.session.get(Image, image_pk), True)
 
     def insert_prediction_raster(
         self, raster: Raster, image_id: int, raster_url: str
@@ -73,18 +132,94 @@ class Insert:
         return prediction_raster
 
     def insert_prediction_vectors(
-        self, vectors: Iterable[Vector], raster_id: int
+        self, vectors: Iterable[Vector] | VectorBatch, raster_id: int
     ) -> list[PredictionVector]:
-        prediction_vectors = [
-            PredictionVector(
-                v.pixel_value, from_shape(v.geometry, srid=v.crs), raster_id
-            )
-            for v in vectors
-        ]
+        job_id, timestamp = self._prediction_vector_partition(raster_id)
+        if isinstance(vectors, VectorBatch):
+            prediction_vectors = [
+                PredictionVector(
+                    pixel_value,
+                    WKBElement(wkb, srid=vectors.crs),
+                    raster_id,
+                    job_id,
+                    timestamp,
+                )
+                for pixel_value, wkb in zip(
+                    vectors.pixel_values.tolist(), vectors.to_wkb(), strict=True
+                )
+            ]
+        else:
+            prediction_vectors = [
+                PredictionVector(
+                    v.pixel_value,
+                    from_shape(v.geometry, srid=v.crs),
+                    raster_id,
+                    job_id,
+                    timestamp,
+                )
+                for v in vectors
+            ]
         self.session.bulk_save_objects(prediction_vectors)
         self.session.commit()
         return prediction_vectors
 
+    def copy_prediction_vectors(
+        self,
+        vectors: Iterable[Vector] | VectorBatch,
+        raster_id: int,
+        chunk_size: int = COPY_CHUNK_SIZE,
+    ) -> int:
+        """Stream vectors into ``prediction_vectors`` with ``COPY`` in chunks
+        of ``chunk_size`` rows, geometries are sent as hex EWKB. Falls back
+        to ``insert_prediction_vectors`` when the session is not bound to
+        PostgreSQL. Returns the number of inserted rows."""
+        if not self._is_postgresql():
+            return len(self.insert_prediction_vectors(vectors, raster_id))
+
+        job_id, timestamp = self._prediction_vector_partition(raster_id)
+        table = PredictionVector.__table__
+        sql = (
+            f"COPY {table.name} (pixel_value, geometry, prediction_raster_id, "
+            "job_id, image_timestamp) FROM STDIN"
+        )
+        count = 0
+        cursor = self.session.connection().connection.cursor()
+        try:
+            for batch in _vector_chunks(vectors, chunk_size):
+                cursor.copy_expert(
+                    sql, _copy_buffer(batch, raster_id, job_id, timestamp)
+                )
+                count += len(batch)
+        finally:
+            cursor.close()
+        self.session.commit()
+        return count
+
+    def _prediction_vector_partition(
+        self, raster_id: int
+    ) -> tuple[int, datetime.datetime]:
+        """Job id and image timestamp stored with the vectors of ``raster_id``.
+        Creates the partition they are routed to if the table is partitioned.
+        """
+        job_id, timestamp = self.session.execute(
+            select(Image.job_id, Image.timestamp)
+            .join(PredictionRaster, PredictionRaster.image_id == Image.id)
+            .where(PredictionRaster.id == raster_id)
+        ).one()
+        if self.partition_by is not None and self._is_postgresql():
+            create_partition(
+                self.session.connection(),
+                PredictionVector.__tablename__,
+                self.partition_by,
+                job_id,
+                timestamp,
+            )
+        return job_id, timestamp
+
+    def _is_postgresql(self) -> bool:
+        get_bind = getattr(self.session, "get_bind", None)
+        return get_bind is not None and get_bind().dialect.name == "postgresql"
+
     def insert_scls_vectors(
         self, vectors: Iterable[Vector], image_id: int
     ) -> list[SceneClassificationVector]:
@@ -107,11 +242,114 @@ class Insert:
 
         return inserted_vectors
 
+    def bulk_insert_scls_vectors(
+        self,
+        vectors: Iterable[Vector] | VectorBatch,
+        image_id: int,
+        chunk_size: int = COPY_CHUNK_SIZE,
+    ) -> InsertCounts:
+        """Insert all SCL polygons of an image in one transaction.
+
+        The polygons are copied into a temporary staging table and merged
+        into ``scene_classification_vectors`` with a single statement that
+        skips polygons already stored for the image, duplicates within the
+        batch and rows violating a unique constraint. Falls back to
+        ``insert_scls_vectors`` when the session is not bound to PostgreSQL.
+        """
+        if not self._is_postgresql():
+            vectors = list(vectors)
+            inserted = len(self.insert_scls_vectors(vectors, image_id))
+            return InsertCounts(inserted, len(vectors) - inserted)
+
+        table = SceneClassificationVector.__table__
+        connection = self.session.connection()
+        connection.execute(
+            text(
+                "CREATE TEMP TABLE scls_staging "
+                "(pixel_value integer, geometry geometry) ON COMMIT DROP"
+            )
+        )
+        total = 0
+        cursor = connection.connection.cursor()
+        try:
+            for batch in _vector_chunks(vectors, chunk_size):
+                cursor.copy_expert(
+                    "COPY scls_staging (pixel_value, geometry) FROM STDIN",
+                    _copy_buffer(batch),
+                )
+                total += len(batch)
+        finally:
+            cursor.close()
+
+        result = connection.execute(
+            text(f"""
+                INSERT INTO {table.name} (pixel_value, geometry, image_id)
+                SELECT DISTINCT s.pixel_value, s.geometry, :image_id
+                FROM scls_staging s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {table.name} t
+                    WHERE t.image_id = :image_id
+                    AND t.pixel_value = s.pixel_value
+                    AND ST_Equals(t.geometry, s.geometry)
+                )
+                ON CONFLICT DO NOTHING
+                """),
+            {"image_id": image_id},
+        )
+        self.session.commit()
+
+        inserted = result.rowcount
+        return InsertCounts(inserted, total - inserted)
+
+
+class SceneUploads(NamedTuple):
+    image_url: Future[str]
+    pred_raster_url: Future[str]
+    # the uploaded prediction raster, when ``upload`` transformed it
+    pred_raster: Optional[Future[Raster]] = None
+
 
 class InsertJob:
     def __init__(self, insert: Insert):
         self.insert = insert
 
+    @staticmethod
+    def upload(
+        model_name: str,
+        download_response: DownloadResponse,
+        pred_raster: Raster,
+        transform: Optional[Callable[[Raster], Raster]] = None,
+        image: Optional[Raster] = None,
+    ) -> SceneUploads:
+        """Start encoding and uploading the image and prediction raster of a
+        scene in the background, both uploads run concurrently. With a
+        ``transform``, e.g. a reprojection, the prediction raster is
+        transformed by the same background task that uploads it.
+
+        ``image`` is uploaded instead of the downloaded content when given,
+        e.g. without bands only requested for the service, and is encoded
+        from its array by the upload task."""
+        unique_id = f"{download_response.bbox}/{download_response.image_id}"
+        object_name = f"predictions/{model_name}/{unique_id}.tif"
+        image_name = f"images/{unique_id}.tif"
+        if image is None:
+            image_url = s3.submit(upload_image, download_response.content, image_name)
+        else:
+            image_url = s3.submit(upload_raster, image, image_name, "average")
+        if transform is None:
+            return SceneUploads(
+                image_url, s3.submit(upload_raster, pred_raster, object_name)
+            )
+
+        transformed: Future[Raster] = Future()
+        return SceneUploads(
+            image_url,
+            s3.submit(
+                _transform_and_upload, pred_raster, transform, object_name, transformed
+            ),
+            transformed,
+        )
+
     def insert_all(
         self,
         job_id: int,
@@ -120,34 +358,118 @@ class InsertJob:
         download_response: DownloadResponse,
         image: Raster,
         pred_raster: Raster,
-        vectors: Iterable[Vector],
-    ) -> Optional[tuple[Image, PredictionRaster, PredictionVector]]:
+        vectors: Iterable[Vector] | VectorBatch,
+        uploads: Optional[SceneUploads] = None,
+    ) -> tuple[Image, Optional[PredictionRaster], int]:
+        """Insert the rows of a scene, each row once the upload it points to
+        has finished. Starts the uploads unless ``uploads`` are given. When
+        the image is already stored, e.g. by a concurrent run of the job, its
+        prediction raster and vectors are not inserted again."""
         unique_id = f"{download_response.bbox}/{download_response.image_id}"
-        image_url = s3.stream_to_s3(
-            io.BytesIO(download_response.content),
-            config.S3_BUCKET_NAME,
-            f"images/{unique_id}.tif",
-        )
+        if uploads is None:
+            uploads = self.upload(model_name, download_response, pred_raster)
 
-        image_db = self.insert.insert_image(
-            download_response, image, image_url, job_id, satellite_id
+        image_db, inserted = self.insert.insert_image(
+            download_response,
+            image,
+            uploads.image_url.result(),
+            job_id,
+            satellite_id,
         )
+        if not inserted:
+            LOGGER.warning(
+                f"Image {unique_id} already in database, skipping its predictions"
+            )
+            return image_db, None, 0
         LOGGER.info(f"Inserted image {unique_id} into database")
-        pred_raster_url = s3.stream_to_s3(
-            io.BytesIO(pred_raster.content),
-            config.S3_BUCKET_NAME,
-            f"predictions/{model_name}/{unique_id}.tif",
-        )
         prediction_raster_db = self.insert.insert_prediction_raster(
-            pred_raster, image_db.id, pred_raster_url
+            (
+                pred_raster
+                if uploads.pred_raster is None
+                else uploads.pred_raster.result()
+            ),
+            image_db.id,
+            uploads.pred_raster_url.result(),
         )
         LOGGER.info(f"Inserted prediction raster for image {unique_id} into database")
-        prediction_vectors_db = self.insert.insert_prediction_vectors(
+        vector_count = self.insert.copy_prediction_vectors(
             vectors, prediction_raster_db.id
         )
-        LOGGER.info(f"Inserted prediction vectors for image {unique_id} into database")
+        LOGGER.info(
+            f"Inserted {vector_count} prediction vectors for image {unique_id} into database"
+        )
+
+        return image_db, prediction_raster_db, vector_count
+
+
+def upload_image(content: bytes, object_name: str) -> str:
+    """Upload GeoTIFF ``content`` to the bucket, converted to a COG when
+    ``COG_OUTPUT`` is set, and return its URL."""
+    if config.COG_OUTPUT:
+        content = to_cog(
+            content, compress=config.COG_COMPRESSION, blocksize=config.COG_BLOCKSIZE
+        )
+    return s3.stream_to_s3(io.BytesIO(content), config.S3_BUCKET_NAME, object_name)
+
+
+def upload_raster(
+    raster: Raster, object_name: str, overview_resampling: str = "nearest"
+) -> str:
+    """Upload ``raster`` to the bucket, encoded as a COG when ``COG_OUTPUT``
+    is set, and return its URL. Overviews use nearest resampling by default
+    so they only contain pixel values of the raster."""
+    if config.COG_OUTPUT:
+        content = write_cog(
+            raster.to_numpy(),
+            raster.meta,
+            compress=config.COG_COMPRESSION,
+            blocksize=config.COG_BLOCKSIZE,
+            overview_resampling=overview_resampling,
+        )
+    else:
+        content = raster.content
+    return s3.stream_to_s3(io.BytesIO(content), config.S3_BUCKET_NAME, object_name)
+
+
+def _transform_and_upload(
+    raster: Raster,
+    transform: Callable[[Raster], Raster],
+    object_name: str,
+    transformed: Future[Raster],
+) -> str:
+    """Upload ``transform(raster)`` and pass it to ``transformed``."""
+    try:
+        raster = transform(raster)
+    except Exception as e:
+        transformed.set_exception(e)
+        raise
+    transformed.set_result(raster)
+    return upload_raster(raster, object_name)
+
 
-        return image_db, prediction_raster_db, prediction_vectors_db
+def _vector_chunks(
+    vectors: Iterable[Vector] | VectorBatch, chunk_size: int
+) -> Generator[VectorBatch, None, None]:
+    if isinstance(vectors, VectorBatch):
+        for start in range(0, len(vectors), chunk_size):
+            yield vectors.filter(slice(start, start + chunk_size))  # type: ignore
+        return
+
+    iterator = iter(vectors)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield VectorBatch.from_vectors(chunk, chunk[0].crs)
+
+
+def _copy_buffer(batch: VectorBatch, *columns) -> io.StringIO:
+    """Rows of ``batch`` in the tab separated ``COPY`` text format, followed
+    by the constant ``columns``."""
+    suffix = "".join(f"\t{column}" for column in columns) + "\n"
+    rows = zip(
+        batch.pixel_values.tolist(),
+        batch.to_wkb(include_srid=True, hex=True),
+        strict=True,
+    )
+    return io.StringIO("".join(f"{value}\t{ewkb}{suffix}" for value, ewkb in rows))
 
 
 def set_init_job_status(db_session: Session, job_id: int) -> Job:
@@ -168,20 +490,61 @@ def update_job_status(db_session: Session, job_id: int, status: JobStatus):
     db_session.commit()
 
 
+def delete_job_prediction_vectors(
+    db_session: Session,
+    job_id: int,
+    partition_by: Optional[str] = config.PREDICTION_VECTOR_PARTITIONING,
+):
+    """Remove all prediction vectors of ``job_id``, by dropping its partition
+    when ``prediction_vectors`` is partitioned by job."""
+    table = PredictionVector.__tablename__
+    if partition_by == JOB:
+        name = drop_partition(db_session.connection(), table, JOB, job_id)
+        LOGGER.info(f"Dropped partition {name}")
+    else:
+        result = db_session.execute(
+            delete(PredictionVector).where(PredictionVector.job_id == job_id)
+        )
+        LOGGER.info(f"Deleted {result.rowcount} prediction vectors of job {job_id}")
+    db_session.commit()
+
+
+def scene_key(download_response: DownloadResponse) -> SceneKey:
+    return SceneKey(
+        download_response.image_id,
+        download_response.timestamp,
+        download_response.bbox,
+        download_response.crs,
+    )
+
+
+def scene_dedupe_key(scene: SceneKey, job_id: int) -> str:
+    """Dedupe key of ``scene``, computed from its requested bbox so that
+    scenes can be looked up before they are downloaded."""
+    return image_dedupe_key(
+        scene.image_id,
+        scene.timestamp,
+        reproject_geometry(box(*scene.bbox), scene.crs, 4326),
+        job_id,
+    )
+
+
 def image_in_db(
     db_session: Session, download_response: DownloadResponse, job_id: int
 ) -> bool:
-    bbox = box(*download_response.bbox)
-    bbox_geom_4326 = reproject_geometry(bbox, download_response.crs, 4326)
-    bbox_geom = WKBElement(bbox_geom_4326.wkb, srid=4326)
-
-    image = (
-        db_session.query(Image)
-        .filter(Image.image_id == download_response.image_id)
-        .filter(Image.timestamp == download_response.timestamp)
-        .filter(Image.bbox.ST_Equals(bbox_geom))
-        .filter(Image.job_id == job_id)
-        .first()
-    )
+    return bool(images_in_db(db_session, [scene_key(download_response)], job_id))
+
 
-    return image is not None
+def images_in_db(
+    db_session: Session, scenes: Sequence[SceneKey], job_id: int
+) -> set[SceneKey]:
+    """Return the ``scenes`` already stored for ``job_id``, looked up by
+    their dedupe key in a single query."""
+    if not scenes:
+        return set()
+
+    keys = {scene_dedupe_key(scene, job_id): scene for scene in scenes}
+    stored = db_session.scalars(
+        select(Image.dedupe_key).where(Image.dedupe_key.in_(keys))
+    )
+    return {keys[key] for key in stored}
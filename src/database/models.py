@@ -1,7 +1,12 @@
 import datetime
 import enum
+import hashlib
+from typing import Optional
 
+import numpy as np
+import shapely
 from geoalchemy2 import Geometry, WKBElement
+from geoalchemy2.shape import to_shape
 from sqlalchemy import (
     Boolean,
     Column,
@@ -9,9 +14,9 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
-    UniqueConstraint,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -21,6 +26,31 @@ Base = declarative_base()
 
 CONSTRAINT_STR = String(255)
 
+# decimal places the bbox coordinates are rounded to before hashing, ~1 cm
+DEDUPE_KEY_PRECISION = 7
+
+
+def image_dedupe_key(
+    image_id: str,
+    timestamp: datetime.datetime,
+    bbox: shapely.Geometry,
+    job_id: int,
+) -> str:
+    """Deterministic key identifying an image of a job, computed from the
+    image id, timestamp, EPSG:4326 bbox and job id. The bbox is rounded and
+    normalized before hashing its WKB, so reprojection noise and vertex
+    order do not produce different keys for the same scene. Aware
+    timestamps are compared in naive UTC, as they are stored."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.UTC).replace(tzinfo=None)
+    bbox = shapely.normalize(
+        shapely.transform(bbox, lambda c: np.round(c, DEDUPE_KEY_PRECISION))
+    )
+    digest = hashlib.sha256()
+    digest.update(f"{image_id}|{timestamp.isoformat()}|{job_id}|".encode())
+    digest.update(shapely.to_wkb(bbox, output_dimension=2, byte_order=1))
+    return digest.hexdigest()
+
 
 class JobStatus(enum.Enum):
     PENDING = "PENDING"
@@ -210,7 +240,11 @@ class Job(Base):
 
 class Image(Base):
     __tablename__ = "images"
-    __table_args__ = (UniqueConstraint("image_id", "timestamp", "bbox", "job_id"),)
+    __table_args__ = (
+        # images arrive per job over arbitrary date ranges, so their physical
+        # order does not follow the timestamp and a b-tree is needed
+        Index("ix_images_timestamp", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True)
     satellite_id = Column(Integer, ForeignKey("satellites.id"), nullable=False)
@@ -227,6 +261,7 @@ class Image(Base):
     image_height = Column(Integer, nullable=False)
     bbox = Column(Geometry(geometry_type="POLYGON", srid=4326), nullable=False)
     job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    dedupe_key = Column(String(64), nullable=False, unique=True)
 
     prediction_raster = relationship(
         "PredictionRaster", backref="image", cascade="all, delete, delete-orphan"
@@ -250,6 +285,7 @@ class Image(Base):
         image_height: int,
         bbox,
         job_id: int,
+        dedupe_key: Optional[str] = None,
     ):
         self.satellite_id = satellite_id
         self.image_id = image_id
@@ -262,6 +298,14 @@ class Image(Base):
         self.image_height = image_height
         self.bbox = bbox
         self.job_id = job_id
+        # Insert.insert_image passes the key of the requested scene, which
+        # images_in_db looks up
+        self.dedupe_key = dedupe_key or image_dedupe_key(
+            image_id,
+            timestamp,
+            to_shape(bbox) if isinstance(bbox, WKBElement) else bbox,
+            job_id,
+        )
 
 
 class PredictionRaster(Base):
@@ -311,17 +355,36 @@ class PredictionVector(Base):
     prediction_raster_id = Column(
         Integer, ForeignKey("prediction_rasters.id"), nullable=False, index=True
     )
+    # copied from the image so the table can be partitioned by job or month,
+    # without a foreign key to keep job deletes from scanning the table
+    job_id = Column(Integer, nullable=False)
+    image_timestamp = Column(DateTime, nullable=False)
 
     def __init__(
-        self, pixel_value: int, geometry: WKBElement, prediction_raster_id: int
+        self,
+        pixel_value: int,
+        geometry: WKBElement,
+        prediction_raster_id: int,
+        job_id: Optional[int] = None,
+        image_timestamp: Optional[datetime.datetime] = None,
     ):
         self.pixel_value = pixel_value
         self.geometry = geometry
         self.prediction_raster_id = prediction_raster_id
+        self.job_id = job_id
+        self.image_timestamp = image_timestamp
 
 
 class SceneClassificationVector(Base):
     __tablename__ = "scene_classification_vectors"
+    __table_args__ = (
+        # the SCL service's outer join from images and the bulk insert dedupe
+        Index(
+            "ix_scene_classification_vectors_image_id_pixel_value",
+            "image_id",
+            "pixel_value",
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     pixel_value = Column(Integer, nullable=False)
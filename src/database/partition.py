@@ -0,0 +1,100 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import Connection, Table, text
+from sqlalchemy.schema import CreateColumn
+
+JOB = "job"
+MONTH = "month"
+
+PARTITION_KEYS = {JOB: "job_id", MONTH: "image_timestamp"}
+PARTITION_METHODS = {JOB: "LIST", MONTH: "RANGE"}
+
+
+def _check_partition_by(partition_by: str):
+    if partition_by not in PARTITION_KEYS:
+        raise ValueError(
+            f"Unknown partitioning {partition_by!r}, expected one of "
+            f"{sorted(PARTITION_KEYS)}"
+        )
+
+
+def partitioned_table_ddl(table: Table, partition_by: str, dialect) -> str:
+    """``CREATE TABLE`` statement of ``table`` as a partitioned table. The
+    primary key is extended by the partition key, which PostgreSQL requires
+    for unique constraints on partitioned tables."""
+    _check_partition_by(partition_by)
+    key = PARTITION_KEYS[partition_by]
+    elements = [
+        str(CreateColumn(column).compile(dialect=dialect)) for column in table.columns
+    ]
+    primary_key = [column.name for column in table.primary_key.columns]
+    elements.append(f"PRIMARY KEY ({', '.join(primary_key + [key])})")
+    elements.extend(
+        f"FOREIGN KEY ({fk.parent.name}) "
+        f"REFERENCES {fk.column.table.name} ({fk.column.name})"
+        for fk in table.foreign_keys
+    )
+    columns = ",\n\t".join(elements)
+    return (
+        f"CREATE TABLE {table.name} (\n\t{columns}\n) "
+        f"PARTITION BY {PARTITION_METHODS[partition_by]} ({key})"
+    )
+
+
+def _month_start(timestamp: datetime.datetime) -> datetime.date:
+    return datetime.date(timestamp.year, timestamp.month, 1)
+
+
+def partition_name(
+    table_name: str,
+    partition_by: str,
+    job_id: Optional[int] = None,
+    timestamp: Optional[datetime.datetime] = None,
+) -> str:
+    _check_partition_by(partition_by)
+    if partition_by == JOB:
+        return f"{table_name}_job_{job_id}"
+    return f"{table_name}_{_month_start(timestamp):%Y_%m}"  # type: ignore
+
+
+def create_partition(
+    connection: Connection,
+    table_name: str,
+    partition_by: str,
+    job_id: Optional[int] = None,
+    timestamp: Optional[datetime.datetime] = None,
+) -> str:
+    """Create the partition of ``table_name`` holding rows of ``job_id`` or
+    of the month of ``timestamp`` unless it exists and return its name. An
+    advisory lock serializes concurrent workers creating the same partition.
+    """
+    name = partition_name(table_name, partition_by, job_id, timestamp)
+    if partition_by == JOB:
+        bounds = f"FOR VALUES IN ({int(job_id)})"  # type: ignore
+    else:
+        start = _month_start(timestamp)  # type: ignore
+        end = _month_start(start + datetime.timedelta(days=31))
+        bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    connection.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name}
+    )
+    connection.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name} {bounds}")
+    )
+    return name
+
+
+def drop_partition(
+    connection: Connection,
+    table_name: str,
+    partition_by: str,
+    job_id: Optional[int] = None,
+    timestamp: Optional[datetime.datetime] = None,
+) -> str:
+    """Drop the partition of ``job_id`` or of the month of ``timestamp``,
+    which removes its rows without deleting them one by one."""
+    name = partition_name(table_name, partition_by, job_id, timestamp)
+    connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    return name
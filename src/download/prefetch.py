@@ -0,0 +1,85 @@
+import collections
+import threading
+from collections.abc import Callable, Generator, Iterable
+from typing import Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def prefetch(
+    items: Iterable[T],
+    max_items: int,
+    max_bytes: Optional[int] = None,
+    size: Callable[[T], int] = len,
+) -> Generator[T, None, None]:
+    """Yield ``items`` while a background thread already consumes the next
+    ones, e.g. downloads the next scenes while the current one is processed.
+
+    At most ``max_items`` items, together at most ``max_bytes`` as measured
+    by ``size``, wait in the buffer; a single item larger than ``max_bytes``
+    is still passed through. The byte limit is checked once an item has been
+    produced, so at peak the buffer, one produced item waiting for room and
+    the item held by the caller are in memory. Exceptions raised by
+    ``items`` are re-raised to the caller once the items before them were
+    yielded."""
+    buffer: collections.deque[tuple[T, int]] = collections.deque()
+    condition = threading.Condition()
+    state = {"bytes": 0, "finished": False, "closed": False, "error": None}
+
+    def has_room(item_size: int = 0) -> bool:
+        if state["closed"] or not buffer:
+            return True
+        if len(buffer) >= max_items:
+            return False
+        return max_bytes is None or state["bytes"] + item_size <= max_bytes
+
+    def produce():
+        iterator = iter(items)
+        try:
+            while True:
+                with condition:
+                    condition.wait_for(has_room)
+                    if state["closed"]:
+                        return
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                item_size = size(item)
+                with condition:
+                    condition.wait_for(lambda item_size=item_size: has_room(item_size))
+                    if state["closed"]:
+                        return
+                    buffer.append((item, item_size))
+                    state["bytes"] += item_size
+                    condition.notify_all()
+        except BaseException as e:  # noqa: BLE001
+            # re-raised in the consumer once the items before it were yielded
+            state["error"] = e
+        finally:
+            # lets generators release what they hold, e.g. running downloads
+            if hasattr(iterator, "close"):
+                iterator.close()
+            with condition:
+                state["finished"] = True
+                condition.notify_all()
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            with condition:
+                condition.wait_for(lambda: buffer or state["finished"])
+                if not buffer:
+                    break
+                item, item_size = buffer.popleft()
+                state["bytes"] -= item_size
+                condition.notify_all()
+            yield item
+        if state["error"] is not None:
+            raise state["error"]
+    finally:
+        with condition:
+            state["closed"] = True
+            buffer.clear()
+            condition.notify_all()
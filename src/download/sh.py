@@ -1,6 +1,11 @@
+import collections
 import datetime
+import hashlib
+import json
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Generator
+from typing import Callable, Generator, Optional
 
 from sentinelhub.api.catalog import CatalogSearchIterator, SentinelHubCatalog
 from sentinelhub.api.process import SentinelHubRequest
@@ -10,11 +15,16 @@ from sentinelhub.constants import CRS, MimeType
 from sentinelhub.data_collections import DataCollection
 from sentinelhub.geo_utils import bbox_to_dimensions
 from sentinelhub.geometry import BBox
+from shapely.geometry.base import BaseGeometry
 
-from src._types import BoundingBox, HeightWidth
+from src import config
+from src._types import BoundingBox, HeightWidth, SceneKey
+from src.cache import TieredCache, create_tiered_cache
 
 from .abstractions import DownloadParams, DownloadResponse, DownloadStrategy
 
+LOGGER = logging.getLogger(__name__)
+
 
 @dataclass
 class SentinelHubDownloadParams(DownloadParams):
@@ -22,16 +32,38 @@ class SentinelHubDownloadParams(DownloadParams):
     evalscript: str
     data_collection: DataCollection
     mime_type: MimeType
+    # AOI in EPSG:4326, tiles of ``bbox`` that do not intersect it are
+    # neither searched nor downloaded
+    geometry: Optional[BaseGeometry] = None
 
 
 class SentinelHubDownload(DownloadStrategy):
-    def __init__(self, params: SentinelHubDownloadParams):
+    def __init__(
+        self,
+        params: SentinelHubDownloadParams,
+        exclude_scenes: Optional[Callable[[list[SceneKey]], set[SceneKey]]] = None,
+        cache: Optional[TieredCache] = None,
+        max_workers: int = config.SH_DOWNLOAD_WORKERS,
+    ):
+        """
+        :param exclude_scenes: Called once with the scenes found by the
+            catalog searches, returns the scenes that should not be downloaded,
+            e.g. because they were already processed.
+        :param cache: Stores responses keyed by their request, identical
+            requests are served from it instead of Sentinel Hub.
+        :param max_workers: Number of catalog searches and downloads running
+            concurrently, 1 downloads one scene at a time.
+        """
         self.params = params
+        self.exclude_scenes = exclude_scenes
+        self.cache = cache
+        self.max_workers = max_workers
 
     def _split_bbox(self, bbox: BoundingBox, size=4800) -> list[BBox]:
         bbox_crs = BBox(bbox, crs=CRS.WGS84)
+        shape = self.params.geometry if self.params.geometry is not None else bbox_crs
         return UtmZoneSplitter(
-            [bbox_crs], crs=bbox_crs.crs, bbox_size=size
+            [shape], crs=bbox_crs.crs, bbox_size=size
         ).get_bbox_list()
 
     def _search_images(
@@ -69,44 +101,138 @@ class SentinelHubDownload(DownloadStrategy):
             config=self.params.config,
         )
 
+    def _scene_key(self, search_response: dict, bbox: BBox) -> SceneKey:
+        return SceneKey(
+            image_id=search_response["id"],
+            timestamp=_parse_timestamp(search_response),
+            bbox=BoundingBox(bbox.min_x, bbox.min_y, bbox.max_x, bbox.max_y),
+            crs=int(bbox.crs.value),
+        )
+
     def _download_image(
         self, search_response: dict, request: SentinelHubRequest, bbox: BBox
     ) -> DownloadResponse:
         bbox_size = bbox_to_dimensions(bbox, resolution=10)
-        response_list = request.get_data(decode_data=False, save_data=False)
-        if len(response_list) != 1:
-            raise ValueError("Expected only one image to be returned.")
-        response = response_list[0]
+        headers, content = self._get_response(request)
 
         return DownloadResponse(
             image_id=search_response["id"],
-            timestamp=datetime.datetime.fromisoformat(
-                search_response["properties"]["datetime"].rstrip("Z")
-            ),
+            timestamp=_parse_timestamp(search_response),
             bbox=(bbox.min_x, bbox.min_y, bbox.max_x, bbox.max_y),
             crs=int(bbox.crs.value),
             image_size=HeightWidth(*bbox_size),
             maxcc=self.params.maxcc,
             data_collection=self.params.data_collection.value.api_id,
             request_timestamp=datetime.datetime.strptime(
-                response.headers["Date"], "%a, %d %b %Y %H:%M:%S GMT"
+                headers["Date"], "%a, %d %b %Y %H:%M:%S GMT"
             ),
-            content=response.content,
-            headers=response.headers,
+            content=content,
+            headers=headers,
         )
 
-    def _download_for_bbox(
-        self,
-        bbox: BBox,
-    ) -> Generator[DownloadResponse, None, None]:
-        search_iterator = list(self._search_images(bbox=bbox))
-        for search_response in search_iterator:
-            yield self._download_image(
-                search_response, self._create_request(search_response, bbox), bbox
+    def _get_response(self, request: SentinelHubRequest) -> tuple[dict, bytes]:
+        key = request_key(request)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                LOGGER.info(f"Serving request {key} from the download cache")
+                return _decode_response(cached)
+
+        response_list = request.get_data(decode_data=False, save_data=False)
+        if len(response_list) != 1:
+            raise ValueError("Expected only one image to be returned.")
+        response = response_list[0]
+        headers, content = dict(response.headers), response.content
+        if self.cache is not None:
+            self.cache.put(key, _encode_response(headers, content))
+        return headers, content
+
+    def _search_all(self) -> list[tuple[dict, BBox]]:
+        bboxes = self._split_bbox(self.params.bbox)
+        with ThreadPoolExecutor(max(self.max_workers, 1)) as executor:
+            results = executor.map(
+                lambda _bbox: list(self._search_images(bbox=_bbox)), bboxes
             )
+            return [
+                (search_response, _bbox)
+                for _bbox, search_responses in zip(bboxes, results, strict=True)
+                for search_response in search_responses
+            ]
 
     def download_images(
         self,
     ) -> Generator[DownloadResponse, None, None]:
-        for _bbox in self._split_bbox(self.params.bbox):
-            yield from self._download_for_bbox(_bbox)
+        scenes = self._search_all()
+        if self.exclude_scenes is not None and scenes:
+            keys = [self._scene_key(*scene) for scene in scenes]
+            excluded = self.exclude_scenes(keys)
+            scenes = [
+                scene
+                for scene, key in zip(scenes, keys, strict=True)
+                if key not in excluded
+            ]
+            LOGGER.info(
+                f"Skipping {len(keys) - len(scenes)} of {len(keys)} scenes, "
+                "downloading the rest"
+            )
+
+        requests = [
+            (search_response, self._create_request(search_response, _bbox), _bbox)
+            for search_response, _bbox in scenes
+        ]
+        if self.max_workers <= 1:
+            for args in requests:
+                yield self._download_image(*args)
+            return
+
+        # max_workers downloads stay in flight while the caller consumes a
+        # response, responses are yielded in catalog order
+        executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="sh-download"
+        )
+        pending: collections.deque[Future[DownloadResponse]] = collections.deque()
+        try:
+            for args in requests:
+                pending.append(executor.submit(self._download_image, *args))
+                if len(pending) > self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+def _parse_timestamp(search_response: dict) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(
+        search_response["properties"]["datetime"].rstrip("Z")
+    )
+
+
+def create_download_cache() -> Optional[TieredCache]:
+    """Download cache configured by ``SH_CACHE_DIR`` and
+    ``SH_CACHE_S3_PREFIX``, None if neither is set."""
+    return create_tiered_cache(
+        config.SH_CACHE_DIR,
+        config.SH_CACHE_MAX_BYTES,
+        config.S3_BUCKET_NAME,
+        config.SH_CACHE_S3_PREFIX,
+    )
+
+
+def request_key(request: SentinelHubRequest) -> str:
+    """Hash of the process API payload, which holds the data collection,
+    evalscript, bbox, time range and output size of the request."""
+    payload = json.dumps(request.payload, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _encode_response(headers: dict, content: bytes) -> bytes:
+    header = json.dumps(headers).encode()
+    return len(header).to_bytes(4, "big") + header + content
+
+
+def _decode_response(value: bytes) -> tuple[dict, bytes]:
+    size = int.from_bytes(value[:4], "big")
+    return json.loads(value[4 : 4 + size]), value[4 + size :]
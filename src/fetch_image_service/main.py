@@ -1,4 +1,3 @@
-import io
 import itertools
 import logging
 
@@ -9,11 +8,11 @@ from sqlalchemy.orm import joinedload
 
 from src import config
 from src._types import BoundingBox
-from src.aws import s3
 from src.database.connect import create_db_session
 from src.database.insert import (
     Insert,
     set_init_job_status,
+    upload_image,
 )
 from src.database.models import (
     AOI,
@@ -27,7 +26,12 @@ from src.raster_op.utils import create_raster_from_download_response
 
 from .._types import TimeRange
 from ..download.evalscripts import generate_evalscript
-from ..download.sh import DataCollection, SentinelHubDownload, SentinelHubDownloadParams
+from ..download.sh import (
+    DataCollection,
+    SentinelHubDownload,
+    SentinelHubDownloadParams,
+    create_download_cache,
+)
 
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("rasterio").setLevel(logging.ERROR)
@@ -95,7 +99,8 @@ def main(job_id: int):
                 evalscript=generate_evalscript(band_names),
                 data_collection=get_data_collection(satellite.name),
                 mime_type=MimeType.TIFF,
-            )
+            ),
+            cache=create_download_cache(),
         )
 
         download_generator = downloader.download_images()
@@ -113,13 +118,11 @@ def main(job_id: int):
             )
             image = create_raster_from_download_response(download_response)
             unique_id = f"{download_response.bbox}/{download_response.image_id}"
-            image_url = s3.stream_to_s3(
-                io.BytesIO(download_response.content),
-                config.S3_BUCKET_NAME,
-                f"images/{unique_id}.tif",
+            image_url = upload_image(
+                download_response.content, f"images/{unique_id}.tif"
             )
             insert = Insert(db_session)
-            _ = insert.insert_image(download_response, image, image_url, job_id, sat_id)
+            insert.insert_image(download_response, image, image_url, job_id, sat_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+import hashlib
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Optional
+
+from src import config
+from src.cache import CacheStats, TieredCache, create_tiered_cache
+
+from .inference_callback import BaseInferenceCallback
+
+
+class CachedInferenceCallback(BaseInferenceCallback):
+    """Wraps an inference callback with a content addressed cache.
+
+    Predictions are keyed by a hash of the payload together with the model id
+    and version, so they are shared across jobs but never across models.
+    Misses are forwarded to ``callback`` and stored in every tier of
+    ``cache``."""
+
+    def __init__(
+        self,
+        callback: BaseInferenceCallback,
+        model_id: str,
+        model_version: int,
+        cache: TieredCache,
+    ):
+        self.callback = callback
+        self.model_id = model_id
+        self.model_version = model_version
+        self.cache = cache
+
+    @property
+    def max_concurrency(self) -> int:  # type: ignore
+        return self.callback.max_concurrency
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def __call__(self, payload: bytes) -> bytes:
+        key = self.key(payload)
+        prediction = self.cache.get(key)
+        if prediction is None:
+            prediction = self.callback(payload)
+            self.cache.put(key, prediction)
+        return prediction
+
+    def batch(self, payloads: Sequence[bytes]) -> list[bytes]:
+        keys = [self.key(payload) for payload in payloads]
+        predictions = [self.cache.get(key) for key in keys]
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            computed = self.callback.batch([payloads[i] for i in missing])
+            for i, prediction in zip(missing, computed, strict=True):
+                self.cache.put(keys[i], prediction)
+                predictions[i] = prediction
+        return predictions  # type: ignore
+
+    def imap_unordered(self, payloads: Iterable[bytes]) -> Iterator[tuple[int, bytes]]:
+        """Hits are yielded as soon as they are found. Once the first miss is
+        sent to ``callback``, hits found while it pulls further payloads are
+        yielded together with its next prediction."""
+        indexed = enumerate(payloads)
+        hits: list[tuple[int, bytes]] = []
+        missing: list[tuple[int, str]] = []
+
+        def misses(first: bytes):
+            yield first
+            for index, payload in indexed:
+                key = self.key(payload)
+                prediction = self.cache.get(key)
+                if prediction is None:
+                    missing.append((index, key))
+                    yield payload
+                else:
+                    hits.append((index, prediction))
+
+        for index, payload in indexed:
+            key = self.key(payload)
+            prediction = self.cache.get(key)
+            if prediction is not None:
+                yield index, prediction
+                continue
+
+            missing.append((index, key))
+            for miss_index, prediction in self.callback.imap_unordered(misses(payload)):
+                payload_index, payload_key = missing[miss_index]
+                self.cache.put(payload_key, prediction)
+                yield from hits
+                hits.clear()
+                yield payload_index, prediction
+            yield from hits
+            return
+
+    def close(self):
+        self.callback.close()
+
+    def key(self, payload: bytes) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{self.model_id}:{self.model_version}:".encode())
+        digest.update(payload)
+        return digest.hexdigest()
+
+
+def create_inference_cache() -> Optional[TieredCache]:
+    """Inference cache configured by ``INFERENCE_CACHE_DIR`` and
+    ``INFERENCE_CACHE_S3_PREFIX``, None if neither is set."""
+    return create_tiered_cache(
+        config.INFERENCE_CACHE_DIR,
+        config.INFERENCE_CACHE_MAX_BYTES,
+        config.S3_BUCKET_NAME,
+        config.INFERENCE_CACHE_S3_PREFIX,
+    )
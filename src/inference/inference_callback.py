@@ -1,10 +1,15 @@
+import asyncio
 import base64
 import json
 import logging
+import random
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Optional
 
+import aiohttp
 import runpod
-from runpod import Endpoint
+from runpod import AsyncioEndpoint, Endpoint
 
 from src import config
 
@@ -12,35 +17,165 @@ LOGGER = logging.getLogger(__name__)
 
 
 class BaseInferenceCallback(ABC):
+    # number of requests ``imap_unordered`` keeps in flight
+    max_concurrency = 1
+
     @abstractmethod
     def __call__(self, payload: bytes) -> bytes:
         """Perform inference on the given payload."""
         pass
 
+    def batch(self, payloads: Sequence[bytes]) -> list[bytes]:
+        """Perform inference on several payloads, returning one prediction per
+        payload in the same order. Subclasses for an endpoint that accepts
+        several payloads in one request should override this, the default
+        calls ``__call__`` for each."""
+        return [self(payload) for payload in payloads]
+
+    def imap_unordered(self, payloads: Iterable[bytes]) -> Iterator[tuple[int, bytes]]:
+        """Yield ``(index, prediction)`` pairs for ``payloads`` as they
+        complete. Subclasses that run requests concurrently override this, the
+        default runs them one after another."""
+        for index, payload in enumerate(payloads):
+            yield index, self(payload)
+
+    def close(self):  # noqa: B027
+        """Release resources held by the callback. Optional, callbacks
+        without resources do not override it."""
+
 
 class RunpodInferenceCallback(BaseInferenceCallback):
-    def __init__(self, endpoint_url: str):
+    def __init__(self, endpoint_url: str, max_retries: int = 3):
         self.endpoint_url = endpoint_url
+        self.max_retries = max_retries
 
     def __call__(self, payload: bytes) -> bytes:
         encoded_payload = base64.b64encode(payload).decode("utf-8")
 
-        request_input = {"input": {"image": encoded_payload}}
+        run_response = self._run({"input": {"image": encoded_payload}})
+
+        return base64.b64decode(run_response["prediction"])
 
+    def _run(self, request_input: dict) -> dict:
         runpod.api_key = config.RUNPOD_API_KEY
         endpoint = Endpoint(self.endpoint_url)
 
-        run_response = endpoint.run_sync(request_input, timeout=120)
+        for attempt in range(self.max_retries + 1):
+            run_response = endpoint.run_sync(request_input, timeout=120)
+            if run_response:
+                return json.loads(run_response)  # type: ignore
+            LOGGER.info(f"Retrying inference, attempt {attempt + 1}")
+
+        raise RuntimeError("Max retries exceeded. Inference failed.")
+
+
+class AsyncRunpodInferenceCallback(BaseInferenceCallback):
+    """Submits payloads to a RunPod endpoint and polls for their results,
+    keeping up to ``max_concurrency`` jobs in flight.
+
+    The callback owns a private event loop and a single ``aiohttp`` session
+    that are created on first use and reused until ``close`` is called.
+    Failed, timed out or dropped jobs are resubmitted up to ``max_retries``
+    times with exponential backoff."""
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        max_concurrency: int = 8,
+        timeout: int = 120,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        self.endpoint_url = endpoint_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._endpoint: Optional[AsyncioEndpoint] = None
+
+    def __call__(self, payload: bytes) -> bytes:
+        loop = self._ensure_loop()
+        return loop.run_until_complete(self._infer(payload))
+
+    def batch(self, payloads: Sequence[bytes]) -> list[bytes]:
+        predictions = dict(self.imap_unordered(payloads))
+        return [predictions[index] for index in range(len(payloads))]
+
+    def imap_unordered(self, payloads: Iterable[bytes]) -> Iterator[tuple[int, bytes]]:
+        loop = self._ensure_loop()
+        payload_iter = enumerate(payloads)
+        pending: set[asyncio.Task] = set()
+        try:
+            while True:
+                for index, payload in payload_iter:
+                    pending.add(loop.create_task(self._infer_indexed(index, payload)))
+                    if len(pending) >= self.max_concurrency:
+                        break
+                if not pending:
+                    return
+                done, pending = loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(
+                    asyncio.gather(*pending, return_exceptions=True)
+                )
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None:
+            self._loop.run_until_complete(self._session.close())
+        self._loop.close()
+        self._loop, self._session, self._endpoint = None, None, None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+
+    async def _get_endpoint(self) -> AsyncioEndpoint:
+        if self._endpoint is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+            )
+            self._endpoint = AsyncioEndpoint(
+                self.endpoint_url, self._session, api_key=config.RUNPOD_API_KEY
+            )
+        return self._endpoint
+
+    async def _infer_indexed(self, index: int, payload: bytes) -> tuple[int, bytes]:
+        return index, await self._infer(payload)
+
+    async def _infer(self, payload: bytes) -> bytes:
+        endpoint = await self._get_endpoint()
+        request_input = {"image": base64.b64encode(payload).decode("utf-8")}
 
-        max_retries = 3
-        retries = 0
-        if not run_response:
-            LOGGER.info("Retrying inference")
-            retries += 1
-            return self.__call__(payload)
-        if retries > max_retries:
-            raise RuntimeError("Max retries exceeded. Inference failed.")
+        for attempt in range(self.max_retries + 1):
+            try:
+                job = await endpoint.run(request_input)
+                try:
+                    run_response = await job.output(timeout=self.timeout)
+                except TimeoutError:
+                    await job.cancel()
+                    raise
+                if run_response:
+                    return base64.b64decode(json.loads(run_response)["prediction"])
+                LOGGER.info(f"Inference job {job.job_id} returned no output")
+            except (aiohttp.ClientError, TimeoutError) as e:
+                LOGGER.info(f"Inference request failed: {e}")
 
-        pred_bytes = base64.b64decode(json.loads(run_response)["prediction"])  # type: ignore
+            if attempt < self.max_retries:
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
 
-        return pred_bytes
+        raise RuntimeError("Max retries exceeded. Inference failed.")
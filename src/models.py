@@ -2,10 +2,16 @@
 
 import datetime as dt
 import io
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
+from typing import Optional
 
 import numpy as np
 import rasterio
+import shapely
+from pyproj import Transformer
+from rasterio.crs import CRS
+from rasterio.transform import array_bounds
 from shapely.geometry.base import BaseGeometry
 from shapely.geometry.polygon import Polygon
 
@@ -26,9 +32,47 @@ class DownloadResponse:
     headers: dict
 
 
-@dataclass(frozen=True)
+class _LazyField:
+    """Dataclass field that is derived on first access when it was not given.
+
+    ``Raster`` can be created from GeoTIFF bytes, from a decoded array, or
+    both. Whichever representation is missing is produced by ``loader`` the
+    first time it is read and cached on the instance.
+    """
+
+    def __init__(self, loader: str, required: bool = False):
+        self.loader = loader
+        self.required = required
+
+    def __set_name__(self, owner, name):
+        self.attr = f"_{name}"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            if self.required:
+                raise AttributeError(self.attr)
+            return None
+        value = obj.__dict__.get(self.attr)
+        if value is None:
+            getattr(obj, self.loader)()
+            value = obj.__dict__[self.attr]
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.attr] = value
+
+
+@dataclass(frozen=True, eq=False)
 class Raster:
-    content: bytes
+    """A georeferenced raster.
+
+    Operations pass the decoded ``array`` and ``transform`` along so that
+    GeoTIFF ``content`` is only encoded when something needs the bytes,
+    e.g. an upload or ``to_file``. Pass ``content=None`` together with an
+    array to create an array-backed raster.
+    """
+
+    content: bytes = _LazyField("_encode", required=True)  # type: ignore
     size: HeightWidth
     dtype: str
     crs: int
@@ -36,20 +80,56 @@ class Raster:
     resolution: float
     geometry: Polygon
     padding_size: HeightWidth = HeightWidth(0, 0)
+    array: Optional[np.ndarray] = _LazyField("_decode")  # type: ignore
+    transform: Optional[rasterio.Affine] = _LazyField("_decode")  # type: ignore
 
     def __post_init__(self):
         if self.dtype not in IMAGE_DTYPES:
             raise ValueError(f"Invalid dtype: {self.dtype}")
+        if self.__dict__["_content"] is None and self.__dict__["_array"] is None:
+            raise ValueError("Raster needs either content or an array")
+
+    @property
+    def bounds(self) -> BoundingBox:
+        """Bounds of ``array``, as reported by ``rasterio`` for the dataset."""
+        _, height, width = self.array.shape
+        return BoundingBox(*array_bounds(height, width, self.transform))
+
+    @property
+    def meta(self) -> dict:
+        """Rasterio profile describing ``array``."""
+        array = self.array
+        return {
+            "driver": "GTiff",
+            "dtype": str(array.dtype),
+            "nodata": None,
+            "width": array.shape[2],
+            "height": array.shape[1],
+            "count": array.shape[0],
+            "crs": CRS.from_epsg(self.crs),
+            "transform": self.transform,
+        }
 
     def to_file(self, path: str):
         with open(path, "wb") as f:
             f.write(self.content)
 
     def to_numpy(self) -> np.ndarray:
+        """Return the decoded array. It is shared with the raster, do not
+        modify it in place."""
+        return self.array
+
+    def _decode(self):
         with rasterio.MemoryFile(io.BytesIO(self.content)) as memfile:
             with memfile.open() as dataset:
-                array = dataset.read()
-        return array
+                self.__dict__["_array"] = dataset.read()
+                self.__dict__["_transform"] = dataset.transform
+
+    def _encode(self):
+        buffer = io.BytesIO()
+        with rasterio.open(buffer, "w+", **self.meta) as dst:
+            dst.write(self.array)
+        self.__dict__["_content"] = buffer.getvalue()
 
 
 @dataclass(frozen=True)
@@ -67,3 +147,173 @@ class Vector:
             "geometry": self.geometry.__geo_interface__,
             "properties": {"pixel_value": self.pixel_value},
         }
+
+
+@dataclass(frozen=True, eq=False)
+class VectorBatch:
+    """Columnar collection of vectors sharing one CRS.
+
+    Points are stored as ``x`` and ``y`` coordinate arrays, other geometries
+    as an array of WKB bytes in ``wkb``. Filtering, reprojection and
+    serialization work on whole arrays instead of one ``Vector`` at a time.
+    """
+
+    pixel_values: np.ndarray
+    crs: int
+    x: Optional[np.ndarray] = None
+    y: Optional[np.ndarray] = None
+    wkb: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        if (self.x is None) == (self.wkb is None):
+            raise ValueError("VectorBatch needs either x and y or wkb")
+
+    @classmethod
+    def from_points(
+        cls, x: np.ndarray, y: np.ndarray, pixel_values: np.ndarray, crs: int
+    ) -> "VectorBatch":
+        return cls(pixel_values=pixel_values, crs=crs, x=x, y=y)
+
+    @classmethod
+    def from_geometries(
+        cls, geometries, pixel_values: np.ndarray, crs: int
+    ) -> "VectorBatch":
+        return cls(
+            pixel_values=np.asarray(pixel_values),
+            crs=crs,
+            wkb=shapely.to_wkb(np.asarray(geometries, dtype=object)),
+        )
+
+    @classmethod
+    def from_vectors(cls, vectors: Iterable["Vector"], crs: int) -> "VectorBatch":
+        vectors = list(vectors)
+        if any(vector.crs != crs for vector in vectors):
+            raise ValueError(f"All vectors must be in EPSG:{crs}")
+        return cls.from_geometries(
+            [vector.geometry for vector in vectors],
+            np.array([vector.pixel_value for vector in vectors], dtype=np.int64),
+            crs,
+        )
+
+    @property
+    def is_points(self) -> bool:
+        return self.x is not None
+
+    @property
+    def geometries(self) -> np.ndarray:
+        """Shapely geometries of the batch, created on every access."""
+        if self.is_points:
+            return shapely.points(self.x, self.y)
+        return shapely.from_wkb(self.wkb)
+
+    def __len__(self) -> int:
+        return len(self.pixel_values)
+
+    def __iter__(self) -> Iterator["Vector"]:
+        for pixel_value, geometry in zip(
+            self.pixel_values.tolist(), self.geometries, strict=True
+        ):
+            yield Vector(geometry=geometry, crs=self.crs, pixel_value=pixel_value)
+
+    def filter(self, mask: np.ndarray) -> "VectorBatch":
+        """Select the vectors where ``mask`` is True."""
+        return VectorBatch(
+            pixel_values=self.pixel_values[mask],
+            crs=self.crs,
+            x=None if self.x is None else self.x[mask],
+            y=None if self.y is None else self.y[mask],
+            wkb=None if self.wkb is None else self.wkb[mask],
+        )
+
+    def to_crs(self, crs: int) -> "VectorBatch":
+        if crs == self.crs:
+            return self
+        transformer = Transformer.from_crs(self.crs, crs, always_xy=True)
+        if self.is_points:
+            x, y = transformer.transform(self.x, self.y)
+            return VectorBatch.from_points(x, y, self.pixel_values, crs)
+
+        geometries = shapely.transform(
+            self.geometries,
+            lambda coords: np.column_stack(
+                transformer.transform(coords[:, 0], coords[:, 1])
+            ),
+        )
+        return VectorBatch.from_geometries(geometries, self.pixel_values, crs)
+
+    def to_wkb(self, include_srid: bool = False, hex: bool = False) -> np.ndarray:
+        """Array of WKB, or EWKB with ``include_srid``, one per vector."""
+        if not include_srid and not hex and self.wkb is not None:
+            return self.wkb
+        if hex and self.is_points:
+            return self._point_hex_wkb(include_srid)
+        geometries = self.geometries
+        if include_srid:
+            geometries = shapely.set_srid(geometries, self.crs)
+        return shapely.to_wkb(geometries, hex=hex, include_srid=include_srid)
+
+    def _point_hex_wkb(self, include_srid: bool) -> np.ndarray:
+        """Hex (E)WKB of little endian points, packed with NumPy instead of
+        creating a shapely geometry per point."""
+        fields = [("byte_order", "u1"), ("type", "<u4")]
+        if include_srid:
+            fields.append(("srid", "<u4"))
+        fields += [("x", "<f8"), ("y", "<f8")]
+        records = np.empty(len(self), dtype=np.dtype(fields))
+        records["byte_order"] = 1
+        records["type"] = 0x20000001 if include_srid else 1
+        if include_srid:
+            records["srid"] = self.crs
+        records["x"], records["y"] = self.x, self.y
+
+        raw = records.view(np.uint8).reshape(len(self), records.itemsize)
+        digits = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+        chars = np.empty((len(self), 2 * records.itemsize), dtype=np.uint8)
+        chars[:, 0::2] = digits[raw >> 4]
+        chars[:, 1::2] = digits[raw & 0x0F]
+        width = chars.shape[1]
+        return chars.view(f"S{width}").ravel().astype(f"U{width}")
+
+    @property
+    def geojson(self) -> dict:
+        if self.crs != 4326:
+            raise ValueError("Only EPSG:4326 format is supported for GeoJSON")
+        if self.is_points:
+            geometries = [
+                {"type": "Point", "coordinates": coords}
+                for coords in zip(self.x.tolist(), self.y.tolist(), strict=True)  # type: ignore
+            ]
+        else:
+            geometries = [geom.__geo_interface__ for geom in self.geometries]
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": geometry,
+                    "properties": {"pixel_value": pixel_value},
+                }
+                for geometry, pixel_value in zip(
+                    geometries, self.pixel_values.tolist(), strict=True
+                )
+            ],
+        }
+
+    @classmethod
+    def concat(cls, batches: Iterable["VectorBatch"]) -> "VectorBatch":
+        batches = list(batches)
+        crs = batches[0].crs
+        if any(batch.crs != crs for batch in batches):
+            raise ValueError("Cannot concatenate batches in different CRS")
+        if all(batch.is_points for batch in batches):
+            return cls.from_points(
+                np.concatenate([batch.x for batch in batches]),
+                np.concatenate([batch.y for batch in batches]),
+                np.concatenate([batch.pixel_values for batch in batches]),
+                crs,
+            )
+        return cls(
+            pixel_values=np.concatenate([batch.pixel_values for batch in batches]),
+            crs=crs,
+            wkb=np.concatenate([batch.to_wkb() for batch in batches]),
+        )
@@ -1,5 +1,7 @@
 import itertools
 import logging
+from collections.abc import Callable, Iterable
+from typing import Optional
 
 import click
 from geoalchemy2.shape import to_shape
@@ -14,7 +16,7 @@ from src.database.connect import create_db_session
 from src.database.insert import (
     Insert,
     InsertJob,
-    image_in_db,
+    images_in_db,
     set_init_job_status,
     update_job_status,
 )
@@ -27,25 +29,31 @@ from src.database.models import (
     ModelType,
     Satellite,
 )
-from src.inference.inference_callback import RunpodInferenceCallback
+from src.geo_utils import reproject_geometry
+from src.inference.cache import CachedInferenceCallback, create_inference_cache
+from src.inference.inference_callback import (
+    AsyncRunpodInferenceCallback,
+    BaseInferenceCallback,
+)
+from src.raster_op.band import RasterioRemoveBand
 from src.raster_op.clip import RasterioClip
 from src.raster_op.composite import CompositeRasterOperation
 from src.raster_op.convert import RasterioDtypeConversion
-from src.raster_op.inference import RasterioInference
-from src.raster_op.merge import RasterioRasterMerge
-from src.raster_op.padding import RasterioRasterPad, RasterioRasterUnpad
-from src.raster_op.reproject import RasterioRasterReproject
-from src.raster_op.split import RasterioRasterSplit
+from src.raster_op.inference import RasterioTiledInference
+from src.raster_op.reproject import RasterioReprojectClip
 from src.raster_op.utils import create_raster_from_download_response
 from src.raster_op.vectorize import RasterioRasterToPoint
+from src.raster_op.water_mask import load_water_mask
 from src.vector_op import probability_to_pixelvalue
 
-from .._types import HeightWidth, TimeRange
+from .._types import HeightWidth, SceneKey, TimeRange
 from ..download.abstractions import DownloadResponse
 from ..download.evalscripts import generate_evalscript
+from ..download.prefetch import prefetch
 from ..download.sh import (
     SentinelHubDownload,
     SentinelHubDownloadParams,
+    create_download_cache,
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -73,6 +81,19 @@ def is_segmentation(model: Model) -> bool:
     return model.type.value == ModelType.SEGMENTATION.value
 
 
+def create_inference_callback(model: Model) -> BaseInferenceCallback:
+    callback = AsyncRunpodInferenceCallback(
+        endpoint_url=model.model_url, max_concurrency=config.INFERENCE_CONCURRENCY
+    )
+    cache = create_inference_cache()
+    if cache is None:
+        return callback
+
+    return CachedInferenceCallback(
+        callback, model_id=model.model_id, model_version=model.version, cache=cache
+    )
+
+
 def process_response(
     download_response: DownloadResponse,
     job_id: int,
@@ -80,37 +101,65 @@ def process_response(
     aoi_geometry: Polygon,
     model: Model,
     satellite_id: int,
-):
-    with create_db_session() as db_session:
-        if image_in_db(db_session, download_response, job_id):
-            LOGGER.warning(
-                f"Image {model.model_id}/{download_response.bbox}/{download_response.image_id} already in db"
-            )
-            return
+    inference_callback: BaseInferenceCallback,
+    scl_band: Optional[int] = None,
+) -> Optional[Callable[[], None]]:
+    """Run inference on a scene and start uploading its rasters. Returns a
+    function inserting the scene's rows once the uploads finished, so the
+    caller can process the next scene while they are running.
 
+    ``inference_callback`` is shared by all scenes of the job so its
+    connections are reused, the caller closes it.
+
+    ``scl_band`` is the 1-based index of the scene classification band used
+    to skip cloudy tiles, it is not passed to the model.
+
+    Scenes stored before the job started are excluded before they are
+    downloaded. One stored since then by a concurrent run of the job is
+    caught by the image's dedupe key on insert, which skips its
+    predictions."""
     image = create_raster_from_download_response(download_response)
+    aoi_scene_geometry = reproject_geometry(aoi_geometry, 4326, image.crs)
+    if not aoi_scene_geometry.intersects(image.geometry):
+        # only tiles intersecting the AOI are downloaded, clipping to the AOI
+        # would fail for a scene that still misses it
+        LOGGER.warning(
+            f"Image {download_response.image_id} does not overlap the AOI, skipping"
+        )
+        return None
 
     comp_op = CompositeRasterOperation()
     comp_op.add(
-        RasterioRasterSplit(
-            HeightWidth(model.expected_image_height, model.expected_image_width)
-        )
-    )
-    comp_op.add(RasterioRasterPad())
-    comp_op.add(
-        RasterioInference(
-            inference_func=RunpodInferenceCallback(endpoint_url=model.model_url),
+        RasterioTiledInference(
+            inference_func=inference_callback,
             output_dtype=model.output_dtype,
+            image_size=HeightWidth(
+                model.expected_image_height, model.expected_image_width
+            ),
+            water_mask=(
+                load_water_mask(config.WATER_MASK_PATH)
+                if config.SKIP_LAND_TILES
+                else None
+            ),
+            water_buffer=config.WATER_MASK_BUFFER,
+            scl_band=scl_band,
+            max_invalid_fraction=config.MAX_INVALID_TILE_FRACTION,
         )
     )
-    comp_op.add(RasterioRasterUnpad())
-    comp_op.add(RasterioRasterMerge())
-    comp_op.add(RasterioRasterReproject(target_crs=4326, target_bands=[1]))
+    # scaled on the whole scene, then only the AOI window is warped or clipped
     comp_op.add(RasterioDtypeConversion(dtype="uint8", scale=is_segmentation(model)))
-    comp_op.add(RasterioClip(aoi_geometry))
+    reproject_clip = RasterioReprojectClip(
+        aoi_geometry, target_crs=4326, target_bands=[1]
+    )
+    if config.VECTORIZE_NATIVE_CRS:
+        comp_op.add(RasterioClip(aoi_scene_geometry, crop=True))
+    else:
+        comp_op.add(reproject_clip)
 
     LOGGER.info(f"Processing raster for image {download_response.image_id}")
     pred_raster = next(comp_op.execute([image]))
+    if isinstance(inference_callback, CachedInferenceCallback):
+        LOGGER.info(f"Inference cache: {inference_callback.stats}")
 
     LOGGER.info(f"Got prediction raster for image {download_response.image_id}")
     threshold = (
@@ -118,23 +167,68 @@ def process_response(
         if is_segmentation(model)
         else None
     )
-    pred_vectors = list(RasterioRasterToPoint(threshold=threshold).execute(pred_raster))
+    pred_vectors = RasterioRasterToPoint(
+        threshold=threshold, target_crs=4326
+    ).execute_batch(pred_raster)
 
     LOGGER.info(
         f"Got {len(pred_vectors)} prediction vectors for image {download_response.image_id}"
     )
 
-    with create_db_session() as db_session:
-        insert_job = InsertJob(insert=Insert(db_session))
-        insert_job.insert_all(
-            job_id=job_id,
-            satellite_id=satellite_id,
-            model_name=model.model_id,
-            download_response=download_response,
-            image=image,
-            pred_raster=pred_raster,
-            vectors=pred_vectors,
-        )
+    # with native vectorization the raster is only warped for its upload. The
+    # stored image keeps the bands it had before SCL was requested, it is
+    # sliced here and encoded by the upload task
+    uploads = InsertJob.upload(
+        model.model_id,
+        download_response,
+        pred_raster,
+        transform=(
+            (lambda raster: next(reproject_clip.execute([raster])))
+            if config.VECTORIZE_NATIVE_CRS
+            else None
+        ),
+        image=(
+            next(RasterioRemoveBand(scl_band).execute([image]))
+            if scl_band is not None
+            else None
+        ),
+    )
+
+    def insert_scene():
+        with create_db_session() as db_session:
+            insert_job = InsertJob(insert=Insert(db_session))
+            insert_job.insert_all(
+                job_id=job_id,
+                satellite_id=satellite_id,
+                model_name=model.model_id,
+                download_response=download_response,
+                image=image,
+                pred_raster=pred_raster,
+                vectors=pred_vectors,
+                uploads=uploads,
+            )
+
+    return insert_scene
+
+
+def process_scenes(
+    responses: Iterable[DownloadResponse],
+    process: Callable[[DownloadResponse], Optional[Callable[[], None]]],
+):
+    """Process ``responses`` one after another. The rows of a scene are
+    inserted after the next scene was processed, which overlaps its uploads
+    with the next inference. When a scene fails, the rows of the scene
+    before it are still inserted before the error is raised."""
+    pending_insert: Optional[Callable[[], None]] = None
+    try:
+        for response in responses:
+            insert_scene = process(response)
+            previous_insert, pending_insert = pending_insert, insert_scene
+            if previous_insert is not None:
+                previous_insert()
+    finally:
+        if pending_insert is not None:
+            pending_insert()
 
 
 @click.command()
@@ -178,7 +272,24 @@ def main(
             f"Satellite: {satellite.name} with bands: {band_names}. Timestamps: {job.start_date} - {job.end_date}"
         )
 
-    evalscript = generate_evalscript(band_names)
+    processed: set[SceneKey] = set()
+
+    def processed_scenes(scenes: list[SceneKey]) -> set[SceneKey]:
+        with create_db_session() as db_session:
+            processed.update(images_in_db(db_session, scenes, job_id))
+        return processed
+
+    data_collection = get_data_collection(satellite.name)
+    scl_band = None
+    if (
+        config.SKIP_CLOUDY_TILES
+        and data_collection == DataCollection.SENTINEL2_L2A
+        and "SCL" not in band_names
+    ):
+        scl_band = len(band_names) + 1
+    evalscript = generate_evalscript(
+        band_names if scl_band is None else [*band_names, "SCL"]
+    )
     downloader = SentinelHubDownload(
         SentinelHubDownloadParams(
             bbox=bbox,
@@ -186,35 +297,56 @@ def main(
             maxcc=job.maxcc,
             config=config.SH_CONFIG,
             evalscript=evalscript,
-            data_collection=get_data_collection(satellite.name),
+            data_collection=data_collection,
             mime_type=MimeType.TIFF,
-        )
+            geometry=aoi_geometry,
+        ),
+        exclude_scenes=processed_scenes,
+        cache=create_download_cache(),
     )
 
     download_generator = downloader.download_images()
     try:
         first_response = next(download_generator)
     except StopIteration:
+        if processed:
+            with create_db_session() as db_session:
+                update_job_status(db_session, job_id, JobStatus.COMPLETED)
+            return LOGGER.info(f"All images of job {job_id} were already processed")
         with create_db_session() as db_session:
             update_job_status(db_session, job_id, JobStatus.FAILED)
         return LOGGER.info(f"No images found for job {job_id}")
 
+    # the next scenes download while the current one is processed
+    responses = prefetch(
+        itertools.chain([first_response], download_generator),
+        max_items=config.PREFETCH_SCENES,
+        max_bytes=config.PREFETCH_MAX_BYTES,
+        size=lambda response: len(response.content),
+    )
+    inference_callback = create_inference_callback(model)
     try:
-        for response in itertools.chain([first_response], download_generator):
-            process_response(
+        process_scenes(
+            responses,
+            lambda response: process_response(
                 response,
                 job_id,
                 probability_threshold,
                 aoi_geometry,
                 model,
                 sat_id,
-            )
-
+                inference_callback,
+                scl_band,
+            ),
+        )
     except Exception as e:
         with create_db_session() as db_session:
             update_job_status(db_session, job_id, JobStatus.FAILED)
         LOGGER.error(f"Job {job_id} failed with error {e}")
         raise e
+    finally:
+        responses.close()
+        inference_callback.close()
 
     with create_db_session() as db_session:
         update_job_status(db_session, job_id, JobStatus.COMPLETED)
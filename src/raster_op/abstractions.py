@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Generator, Iterable
 
-from src.models import Raster, Vector
+from src.models import Raster, Vector, VectorBatch
 
 
 class RasterOperationStrategy(ABC):
@@ -14,3 +14,7 @@ class RasterToVectorStrategy(RasterOperationStrategy):
     @abstractmethod
     def execute(self, raster: Raster) -> Generator[Vector, None, None]:
         pass
+
+    def execute_batch(self, raster: Raster) -> VectorBatch:
+        """Return all vectors of ``raster`` as one ``VectorBatch``."""
+        return VectorBatch.from_vectors(self.execute(raster), raster.crs)
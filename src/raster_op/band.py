@@ -1,12 +1,8 @@
-import io
 import logging
 from typing import Generator, Iterable
 
-import numpy as np
-import rasterio
-
 from src.models import Raster
-from src.raster_op.utils import create_raster, write_image
+from src.raster_op.utils import create_raster
 
 from .abstractions import (
     RasterOperationStrategy,
@@ -15,6 +11,17 @@ from .abstractions import (
 LOGGER = logging.getLogger(__name__)
 
 
+def without_band(count: int, band: int) -> slice | list[int]:
+    """Index selecting all bands of a ``count`` band array but the 1-based
+    ``band``. A slice, which selects without copying, when ``band`` is the
+    first or last band."""
+    if band == count:
+        return slice(0, count - 1)
+    if band == 1:
+        return slice(1, count)
+    return [i for i in range(count) if i != band - 1]
+
+
 class RasterioRemoveBand(RasterOperationStrategy):
     def __init__(self, band: int):
         self.band = band
@@ -22,7 +29,6 @@ class RasterioRemoveBand(RasterOperationStrategy):
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            print(raster.bands)
             try:
                 raster.bands[self.band_index]
             except IndexError:
@@ -30,27 +36,26 @@ class RasterioRemoveBand(RasterOperationStrategy):
                 yield raster
                 continue
 
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                meta = src.meta.copy()
-                image = src.read()
-
-                removed_band_image = np.delete(image, self.band_index, axis=0)
-                LOGGER.info(f"Removed band {self.band} from raster")
-                meta.update(
-                    {
-                        "count": removed_band_image.shape[0],
-                        "height": removed_band_image.shape[1],
-                        "width": removed_band_image.shape[2],
-                    }
-                )
-
-                yield create_raster(
-                    write_image(removed_band_image, meta),
-                    removed_band_image,
-                    src.bounds,
-                    meta,
-                    raster.padding_size,
-                )
+            meta = raster.meta
+            image = raster.to_numpy()
+
+            removed_band_image = image[without_band(image.shape[0], self.band)]
+            LOGGER.info(f"Removed band {self.band} from raster")
+            meta.update(
+                {
+                    "count": removed_band_image.shape[0],
+                    "height": removed_band_image.shape[1],
+                    "width": removed_band_image.shape[2],
+                }
+            )
+
+            yield create_raster(
+                None,
+                removed_band_image,
+                raster.bounds,
+                meta,
+                raster.padding_size,
+            )
 
 
 class RasterioRasterBandSelect(RasterOperationStrategy):
@@ -62,22 +67,21 @@ class RasterioRasterBandSelect(RasterOperationStrategy):
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                meta = src.meta.copy()
-                image = src.read()
-                selected_bands_image = image[self.bands]
-                meta.update(
-                    {
-                        "count": selected_bands_image.shape[0],
-                        "height": selected_bands_image.shape[1],
-                        "width": selected_bands_image.shape[2],
-                    }
-                )
-
-                yield create_raster(
-                    write_image(selected_bands_image, meta),
-                    selected_bands_image,
-                    src.bounds,
-                    meta,
-                    raster.padding_size,
-                )
+            meta = raster.meta
+            image = raster.to_numpy()
+            selected_bands_image = image[self.bands]
+            meta.update(
+                {
+                    "count": selected_bands_image.shape[0],
+                    "height": selected_bands_image.shape[1],
+                    "width": selected_bands_image.shape[2],
+                }
+            )
+
+            yield create_raster(
+                None,
+                selected_bands_image,
+                raster.bounds,
+                meta,
+                raster.padding_size,
+            )
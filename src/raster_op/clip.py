@@ -1,9 +1,10 @@
-import io
 import logging
 from typing import Generator, Iterable
 
+import numpy as np
 import rasterio
-from rasterio.mask import mask
+from rasterio import windows
+from rasterio.transform import array_bounds
 from shapely.geometry import Polygon
 
 from src.models import Raster
@@ -11,7 +12,7 @@ from src.models import Raster
 from .abstractions import (
     RasterOperationStrategy,
 )
-from .utils import create_raster, write_image
+from .utils import create_raster, geometry_window, mask_geometry
 
 LOGGER = logging.getLogger(__name__)
 
@@ -23,22 +24,32 @@ class RasterioClip(RasterOperationStrategy):
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                out_image, out_transform = mask(src, [self.geometry], crop=self.crop)
-                out_meta = src.meta.copy()
-
-                out_meta.update(
-                    {
-                        "height": out_image.shape[1],
-                        "width": out_image.shape[2],
-                        "transform": out_transform,
-                    }
-                )
-
-                yield create_raster(
-                    write_image(out_image, out_meta),
-                    out_image,
-                    src.bounds,
-                    out_meta,
-                    raster.padding_size,
-                )
+            out_image, out_transform = self._mask(raster.to_numpy(), raster.transform)
+            out_meta = raster.meta
+
+            out_meta.update(
+                {
+                    "height": out_image.shape[1],
+                    "width": out_image.shape[2],
+                    "transform": out_transform,
+                }
+            )
+
+            yield create_raster(
+                None,
+                out_image,
+                array_bounds(out_image.shape[1], out_image.shape[2], out_transform),
+                out_meta,
+                raster.padding_size,
+            )
+
+    def _mask(
+        self, image: np.ndarray, transform: rasterio.Affine
+    ) -> tuple[np.ndarray, rasterio.Affine]:
+        """Array equivalent of ``rasterio.mask.mask`` with a nodata value of 0."""
+        if self.crop:
+            window = geometry_window(self.geometry, image.shape[1:], transform)
+            image = image[(slice(None), *window.toslices())]
+            transform = windows.transform(window, transform)
+
+        return mask_geometry(image, self.geometry, transform), transform
@@ -1,12 +1,10 @@
-import io
 import logging
 from typing import Generator, Iterable
 
 import numpy as np
-import rasterio
 
 from src.models import Raster
-from src.raster_op.utils import create_raster, write_image
+from src.raster_op.utils import create_raster
 
 from .abstractions import RasterOperationStrategy
 
@@ -25,31 +23,30 @@ class RasterioDtypeConversion(RasterOperationStrategy):
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                meta = src.meta.copy()
-                image = src.read()
-
-                if image.dtype == self.dtype:
-                    LOGGER.info(f"Raster already has dtype {self.dtype}, skipping")
-                    yield raster
-
-                if self.scale:
-                    image = self._scale(image)
-
-                image = image.astype(self.np_dtype)
-
-                meta.update(
-                    {
-                        "dtype": self.dtype,
-                    }
-                )
-                yield create_raster(
-                    write_image(image, meta),
-                    image,
-                    src.bounds,
-                    meta,
-                    raster.padding_size,
-                )
+            meta = raster.meta
+            image = raster.to_numpy()
+
+            if image.dtype == self.dtype:
+                LOGGER.info(f"Raster already has dtype {self.dtype}, skipping")
+                yield raster
+
+            if self.scale:
+                image = self._scale(image)
+
+            image = image.astype(self.np_dtype)
+
+            meta.update(
+                {
+                    "dtype": self.dtype,
+                }
+            )
+            yield create_raster(
+                None,
+                image,
+                raster.bounds,
+                meta,
+                raster.padding_size,
+            )
 
     def _scale(self, image: np.ndarray) -> np.ndarray:
         image_min = image.min()
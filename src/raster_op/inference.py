@@ -1,45 +1,397 @@
-import io
+import itertools
 import logging
-from typing import Callable, Generator, Iterable
+from typing import Callable, Generator, Iterable, NamedTuple, Optional, TypeVar
 
 import numpy as np
 import rasterio
+from rasterio import windows
+from rasterio.merge import MERGE_METHODS
+from rasterio.windows import Window
 
+from src._types import HeightWidth
 from src.models import Raster
-from src.raster_op.utils import create_raster, write_image
+from src.raster_op.band import without_band
+from src.raster_op.merge import FEATHER, FeatherBlend
+from src.raster_op.padding import RasterioRasterPad
+from src.raster_op.split import RasterioRasterSplit
+from src.raster_op.utils import create_raster, update_window_meta, write_image
+from src.raster_op.water_mask import WaterMask
+from src.scl_service.types import SCL
 
 from .abstractions import RasterOperationStrategy
 
 LOGGER = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+DEFAULT_TILE_SIZE = HeightWidth(480, 480)
+
+_END = object()
+
+# scene classes a tile can not be inferred on. Cloud shadows and thin cirrus
+# are left out, the water surface is still visible through them and they
+# cover large parts of otherwise usable scenes
+INVALID_SCL_CLASSES = (
+    SCL.NO_DATA,
+    SCL.SATURATED,
+    SCL.CLOUD_MEDIUM_PROB,
+    SCL.CLOUD_HIGH_PROB,
+)
+
+
+def batched(
+    items: Iterable[T],
+    batch_size: int,
+    max_batch_bytes: Optional[int] = None,
+    size: Callable[[T], int] = len,
+) -> Generator[list[T], None, None]:
+    """Group ``items`` into lists of at most ``batch_size`` items whose
+    ``size`` sums to at most ``max_batch_bytes``. An item larger than
+    ``max_batch_bytes`` is sent on its own."""
+    batch: list[T] = []
+    batch_bytes = 0
+    for item in items:
+        item_bytes = size(item) if max_batch_bytes is not None else 0
+        if batch and (
+            len(batch) >= batch_size
+            or (
+                max_batch_bytes is not None
+                and batch_bytes + item_bytes > max_batch_bytes
+            )
+        ):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(item)
+        batch_bytes += item_bytes
+    if batch:
+        yield batch
+
+
+def infer_batch(
+    inference_func: Callable[[bytes], bytes], payloads: list[bytes]
+) -> list[bytes]:
+    """Run ``inference_func`` on ``payloads``, in a single call when it
+    supports batches.
+
+    None of the RunPod callbacks sends a batch as one request, their
+    ``batch`` still makes a request per payload. This is the hook for an
+    endpoint that accepts several images at once."""
+    if len(payloads) > 1 and hasattr(inference_func, "batch"):
+        return inference_func.batch(payloads)  # type: ignore
+    return [inference_func(payload) for payload in payloads]
+
+
+def predict(
+    inference_func: Callable[[bytes], bytes],
+    items: Iterable[T],
+    payload: Callable[[T], bytes],
+    batch_size: int = 1,
+    max_batch_bytes: Optional[int] = None,
+    ordered: bool = True,
+) -> Generator[tuple[T, bytes], None, None]:
+    """Yield ``(item, prediction)`` for every item.
+
+    With a ``batch_size`` above one items are grouped into batches for
+    ``infer_batch``, which only cuts the number of requests for a callback
+    whose ``batch`` sends them together. Otherwise they
+    are streamed through ``inference_func.imap_unordered`` when available,
+    which lets concurrent callbacks keep several requests in flight. Unless
+    ``ordered`` is False, predictions are buffered until they can be yielded
+    in input order."""
+    if batch_size > 1:
+        # each payload is encoded once, both to size and to send the batch
+        for batch in batched(
+            ((item, payload(item)) for item in items),
+            batch_size,
+            max_batch_bytes,
+            size=lambda pair: len(pair[1]),
+        ):
+            predictions = infer_batch(inference_func, [pair[1] for pair in batch])
+            yield from zip((pair[0] for pair in batch), predictions, strict=True)
+        return
+
+    if not hasattr(inference_func, "imap_unordered"):
+        for item in items:
+            yield item, inference_func(payload(item))
+        return
+
+    # in ordered mode no further payloads are fed while ``max_concurrency``
+    # predictions wait for a slower one. The callback then finishes the
+    # requests in flight and is restarted on the remaining items, so the
+    # buffer is bounded by the concurrency instead of the number of items.
+    max_buffered = getattr(inference_func, "max_concurrency", 1)
+    items = iter(items)
+    pending: dict[int, T] = {}
+    completed: dict[int, bytes] = {}
+    counter = itertools.count()
+    exhausted = False
+
+    def payloads(indices: list[int]):
+        nonlocal exhausted
+        while not ordered or len(completed) < max_buffered:
+            item = next(items, _END)
+            if item is _END:
+                exhausted = True
+                return
+            index = next(counter)
+            pending[index] = item
+            indices.append(index)
+            yield payload(item)  # type: ignore
+
+    next_index = 0
+    while not exhausted:
+        indices: list[int] = []
+        for i, pred_bytes in inference_func.imap_unordered(payloads(indices)):  # type: ignore
+            index = indices[i]
+            if not ordered:
+                yield pending.pop(index), pred_bytes
+                continue
+            completed[index] = pred_bytes
+            while next_index in completed:
+                yield pending.pop(next_index), completed.pop(next_index)
+                next_index += 1
+
 
 class RasterioInference(RasterOperationStrategy):
-    def __init__(self, inference_func: Callable[[bytes], bytes], output_dtype: str):
+    def __init__(
+        self,
+        inference_func: Callable[[bytes], bytes],
+        output_dtype: str,
+        batch_size: int = 1,
+        max_batch_bytes: Optional[int] = None,
+        ordered: bool = True,
+    ):
+        """
+        :param batch_size: Maximum number of rasters sent to ``inference_func``
+            in one ``batch`` call, for callbacks of a batched endpoint.
+        :param max_batch_bytes: Maximum combined size of the encoded rasters
+            in one batch.
+        :param ordered: Yield predictions in input order. When False, rasters
+            are yielded as soon as a concurrent callback returns them.
+        """
         self.inference_func = inference_func
         self.output_dtype = output_dtype
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.ordered = ordered
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
-        for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                meta = src.meta.copy()
+        for raster, pred_bytes in predict(
+            self.inference_func,
+            rasters,
+            lambda raster: raster.content,
+            self.batch_size,
+            self.max_batch_bytes,
+            self.ordered,
+        ):
+            yield self._to_raster(raster, pred_bytes)
 
-                np_buffer = np.frombuffer(
-                    self.inference_func(raster.content), dtype=self.output_dtype
-                )
-                prediction = np_buffer.reshape(1, meta["height"], meta["width"])
-
-                meta.update(
-                    {
-                        "count": prediction.shape[0],
-                        "height": prediction.shape[1],
-                        "width": prediction.shape[2],
-                        "dtype": prediction.dtype,
-                    }
+    def _to_raster(self, raster: Raster, pred_bytes: bytes) -> Raster:
+        meta = raster.meta
+
+        np_buffer = np.frombuffer(pred_bytes, dtype=self.output_dtype)
+        prediction = np_buffer.reshape(1, meta["height"], meta["width"])
+
+        meta.update(
+            {
+                "count": prediction.shape[0],
+                "height": prediction.shape[1],
+                "width": prediction.shape[2],
+                "dtype": prediction.dtype,
+            }
+        )
+        return create_raster(
+            None,
+            prediction,
+            raster.bounds,
+            meta,
+            raster.padding_size,
+        )
+
+
+class RasterioTiledInference(RasterOperationStrategy):
+    """Split, pad, infer, unpad and merge in a single pass.
+
+    Produces the same mosaic as chaining ``RasterioRasterSplit``,
+    ``RasterioRasterPad``, ``RasterioInference``, ``RasterioRasterUnpad`` and
+    ``RasterioRasterMerge``, but computes the window grid once, slices each
+    tile straight from the source array and writes the cropped prediction
+    into a preallocated mosaic. Only the payload sent to ``inference_func``
+    is encoded. ``merge_method="feather"`` blends overlapping predictions
+    with ``FeatherBlend`` instead of keeping the first one.
+
+    With a ``water_mask`` the mask is rasterized once per scene and tiles
+    without water pixels are not sent to the model, their part of the
+    mosaic stays 0.
+
+    With an ``scl_band`` that band holds the scene classification layer. It
+    is not sent to the model, and tiles whose fraction of ``invalid_classes``
+    pixels exceeds ``max_invalid_fraction``, e.g. clouds or tiles outside
+    the data footprint, are skipped the same way.
+    """
+
+    def __init__(
+        self,
+        inference_func: Callable[[bytes], bytes],
+        output_dtype: str,
+        image_size: HeightWidth = DEFAULT_TILE_SIZE,
+        offset: int = 64,
+        padding: int = 64,
+        divisible_by: int = 32,
+        merge_method: str | Callable = "first",
+        batch_size: int = 1,
+        max_batch_bytes: Optional[int] = None,
+        water_mask: Optional[WaterMask] = None,
+        water_buffer: float = 0,
+        scl_band: Optional[int] = None,
+        max_invalid_fraction: float = 0.9,
+        invalid_classes: Iterable[SCL] = INVALID_SCL_CLASSES,
+    ):
+        """
+        :param water_mask: Skip tiles that contain no water pixels.
+        :param water_buffer: Distance in units of the raster's CRS the water
+            polygons are grown by before tiles are checked.
+        :param scl_band: 1-based index of the scene classification band.
+        :param max_invalid_fraction: Skip tiles with a larger fraction of
+            ``invalid_classes`` pixels in the scene classification band.
+        """
+        self.inference_func = inference_func
+        self.output_dtype = output_dtype
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.water_mask = water_mask
+        self.water_buffer = water_buffer
+        self.scl_band = scl_band
+        self.max_invalid_fraction = max_invalid_fraction
+        self.invalid_classes = [scl.value for scl in invalid_classes]
+        self.image_size = image_size
+        self.offset = offset
+        self.merge_method = merge_method
+        self._split = RasterioRasterSplit(image_size=image_size, offset=offset)
+        self._pad = RasterioRasterPad(padding=padding, divisible_by=divisible_by)
+
+    def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
+        for raster in rasters:
+            array = raster.to_numpy()
+            meta = raster.meta
+            scl = None
+            bands: slice | list[int] = slice(None)
+            if self.scl_band is not None:
+                scl = array[self.scl_band - 1]
+                # only the tiles are copied without the band
+                bands = without_band(array.shape[0], self.scl_band)
+                meta["count"] = array.shape[0] - 1
+            mosaic = np.zeros((1, *array.shape[1:]), dtype=self.output_dtype)
+            if self.merge_method == FEATHER:
+                blend = FeatherBlend(mosaic.shape, ramp=self.offset)
+                copyto = blend.add
+            else:
+                copyto = (
+                    MERGE_METHODS[self.merge_method]
+                    if isinstance(self.merge_method, str)
+                    else self.merge_method
                 )
-                yield create_raster(
-                    write_image(prediction, meta),
-                    prediction,
-                    src.bounds,
+
+            windows_ = self._split._generate_windows(
+                raster, self.image_size, self.offset
+            )
+            if self.water_mask is not None:
+                windows_ = self._water_windows(raster, list(windows_))
+            if scl is not None:
+                windows_ = self._valid_windows(scl, list(windows_))
+            tiles = (
+                self._prepare(
+                    window,
+                    array[(bands, *window.toslices())],
                     meta,
-                    raster.padding_size,
+                    windows.transform(window, raster.transform),
                 )
+                for window in windows_
+            )
+            # feathering is order independent, other merge methods depend on
+            # the order tiles arrive in
+            predictions = predict(
+                self.inference_func,
+                tiles,
+                lambda tile: tile.payload,
+                self.batch_size,
+                self.max_batch_bytes,
+                ordered=self.merge_method != FEATHER,
+            )
+            for index, (tile, pred_bytes) in enumerate(predictions):
+                rows, cols = tile.window.toslices()
+                region = mosaic[:, rows, cols]
+                copyto(
+                    region,
+                    self._crop(tile, pred_bytes),
+                    np.isclose(region, 0),
+                    np.ma.nomask,
+                    index=index,
+                    roff=tile.window.row_off,
+                    coff=tile.window.col_off,
+                )
+
+            if self.merge_method == FEATHER:
+                mosaic = blend.result(mosaic.dtype)
+
+            meta.update({"count": 1, "dtype": mosaic.dtype})
+            yield create_raster(None, mosaic, raster.bounds, meta, HeightWidth(0, 0))
+
+    def _water_windows(self, raster: Raster, windows_: list[Window]) -> list[Window]:
+        water = self.water_mask.rasterize(raster, self.water_buffer)  # type: ignore
+        water_windows = [w for w in windows_ if water[w.toslices()].any()]
+        LOGGER.info(
+            f"Skipping {len(windows_) - len(water_windows)} of {len(windows_)} "
+            "tiles without water"
+        )
+        return water_windows
+
+    def _valid_windows(self, scl: np.ndarray, windows_: list[Window]) -> list[Window]:
+        invalid = np.isin(scl, self.invalid_classes)
+        valid_windows = [
+            w
+            for w in windows_
+            if invalid[w.toslices()].mean() <= self.max_invalid_fraction
+        ]
+        LOGGER.info(
+            f"Skipping {len(windows_) - len(valid_windows)} of {len(windows_)} "
+            "tiles covered by clouds or no data"
+        )
+        return valid_windows
+
+    def _prepare(
+        self,
+        window: Window,
+        tile: np.ndarray,
+        meta: dict,
+        transform: rasterio.Affine,
+    ) -> "_Tile":
+        """Pad ``tile`` and encode it as an inference payload."""
+        padding_size = self._pad._calculate_padding_size(tile, self._pad.padding)
+        padded = self._pad._pad_image(tile, padding_size)
+        (top, left), _ = padding_size
+        tile_meta = update_window_meta(meta, padded)
+        tile_meta["transform"] = transform * rasterio.Affine.translation(-left, -top)
+
+        return _Tile(
+            window=window,
+            payload=write_image(padded, tile_meta),
+            shape=HeightWidth(padded.shape[1], padded.shape[2]),
+            padding_size=padding_size,
+        )
+
+    def _crop(self, tile: "_Tile", pred_bytes: bytes) -> np.ndarray:
+        """Crop the prediction for ``tile`` back to the unpadded window."""
+        height, width = tile.shape
+        (top, left), (bottom, right) = tile.padding_size
+        prediction = np.frombuffer(pred_bytes, dtype=self.output_dtype).reshape(
+            1, height, width
+        )
+        return prediction[:, top : height - bottom, left : width - right]
+
+
+class _Tile(NamedTuple):
+    window: Window
+    payload: bytes
+    shape: HeightWidth
+    padding_size: tuple[HeightWidth, HeightWidth]
@@ -1,12 +1,14 @@
-import io
+import functools
+import itertools
+import math
 from typing import Callable, Generator, Iterable, Optional, Union
 
 import numpy as np
-import rasterio
-from rasterio.merge import merge
+from rasterio.merge import MERGE_METHODS
+from rasterio.transform import Affine, array_bounds
 from scipy.ndimage import gaussian_filter
 
-from src._types import HeightWidth
+from src._types import BoundingBox, HeightWidth
 from src.models import Raster
 from src.raster_op.utils import create_raster
 
@@ -21,24 +23,55 @@ class RasterioRasterMerge(RasterOperationStrategy):
         offset: int = 64,
         merge_method: Union[str, Callable] = "first",
         bands: Optional[list[int]] = None,
+        bounds: Optional[BoundingBox] = None,
     ):
+        """
+        :param offset: Overlap between neighbouring tiles in pixels, used as
+            ramp width by the ``"feather"`` merge method.
+        :param merge_method: A ``rasterio.merge`` method name or callable, or
+            ``"feather"`` to blend overlapping tiles with ``FeatherBlend``.
+        :param bounds: Extent of the merged raster, usually the bounds of the
+            raster that was split. When given, the mosaic is allocated up front
+            and tiles are merged as they arrive, so only one tile is held in
+            memory at a time. Otherwise all tiles are collected first to
+            compute their union.
+        """
         self.offset = offset
         self.merge_method = merge_method
         self.bands = bands
-
-        self.buffer = io.BytesIO()
+        self.bounds = bounds
 
     def execute(
         self,
         rasters: Iterable[Raster],
     ) -> Generator[Raster, None, None]:
-        srcs = [rasterio.open(io.BytesIO(r.content)) for r in rasters]
+        rasters = iter(rasters)
+        first = next(rasters, None)
+        if first is None:
+            return
 
-        mosaic, out_trans = merge(srcs, method=self.merge_method, nodata=0)  # type: ignore
-        out_meta = srcs[0].meta.copy()
+        if self.bounds is None:
+            rasters = list(rasters)
+            bounds = self._union_bounds([first, *rasters])
+        else:
+            bounds = self.bounds
 
-        [src.close() for src in srcs]
+        mosaic, out_trans = self._allocate_mosaic(first, bounds)
+        if self.merge_method == FEATHER:
+            blend = FeatherBlend(mosaic.shape, ramp=self.offset)
+            copyto = blend.add
+        else:
+            copyto = (
+                MERGE_METHODS[self.merge_method]
+                if isinstance(self.merge_method, str)
+                else self.merge_method
+            )
+        for index, raster in enumerate(itertools.chain([first], rasters)):
+            self._merge_tile(mosaic, out_trans, raster, index, copyto)
+        if self.merge_method == FEATHER:
+            mosaic = blend.result(mosaic.dtype)
 
+        out_meta = first.meta
         out_meta.update(
             {
                 "driver": "GTiff",
@@ -52,17 +85,140 @@ class RasterioRasterMerge(RasterOperationStrategy):
             out_meta["count"] = len(self.bands)
             mosaic = mosaic[self.bands]
 
-        with rasterio.open(self.buffer, "w+", **out_meta) as dst:
-            dst.write(mosaic)
-
         yield create_raster(
-            self.buffer.getvalue(),
+            None,
             mosaic,
-            dst.bounds,
+            array_bounds(mosaic.shape[1], mosaic.shape[2], out_trans),
             out_meta,
             HeightWidth(0, 0),
         )
 
+    def _union_bounds(self, rasters: list[Raster]) -> BoundingBox:
+        xs, ys = [], []
+        for raster in rasters:
+            left, bottom, right, top = raster.bounds
+            xs.extend([left, right])
+            ys.extend([bottom, top])
+        return BoundingBox(min(xs), min(ys), max(xs), max(ys))
+
+    def _allocate_mosaic(
+        self, first: Raster, bounds: BoundingBox
+    ) -> tuple[np.ndarray, Affine]:
+        dst_w, dst_s, dst_e, dst_n = bounds
+        res_x, res_y = first.transform.a, -first.transform.e
+        out_trans = Affine.translation(dst_w, dst_n) * Affine.scale(res_x, -res_y)
+        mosaic = np.zeros(
+            (
+                first.to_numpy().shape[0],
+                int(round((dst_n - dst_s) / res_y)),
+                int(round((dst_e - dst_w) / res_x)),
+            ),
+            dtype=first.to_numpy().dtype,
+        )
+        return mosaic, out_trans
+
+    def _merge_tile(
+        self,
+        mosaic: np.ndarray,
+        out_trans: Affine,
+        raster: Raster,
+        index: int,
+        copyto: Callable,
+    ):
+        image = raster.to_numpy()
+        roff, coff = self._tile_offset(raster.transform, out_trans)
+
+        # clip tiles that reach beyond the mosaic
+        row_start, col_start = max(roff, 0), max(coff, 0)
+        row_stop = min(roff + image.shape[1], mosaic.shape[1])
+        col_stop = min(coff + image.shape[2], mosaic.shape[2])
+        if row_start >= row_stop or col_start >= col_stop:
+            return
+        image = image[
+            :,
+            row_start - roff : row_stop - roff,
+            col_start - coff : col_stop - coff,
+        ]
+
+        region = mosaic[:, row_start:row_stop, col_start:col_stop]
+        if np.issubdtype(region.dtype, np.integer):
+            region_mask = region == 0
+        else:
+            region_mask = np.isclose(region, 0)
+
+        # tiles carry no nodata value, rasterio passes ``nomask`` for them too
+        copyto(
+            region,
+            image,
+            region_mask,
+            np.ma.nomask,
+            index=index,
+            roff=row_start,
+            coff=col_start,
+        )
+
+    def _tile_offset(self, transform: Affine, out_transform: Affine) -> tuple[int, int]:
+        """Row and column of a tile's origin in the mosaic, aligned the same
+        way as ``rasterio.merge``."""
+        col_off, row_off = ~out_transform * (transform.c, transform.f)
+        return math.floor(row_off + 0.1), math.floor(col_off + 0.1)
+
+
+FEATHER = "feather"
+
+
+@functools.lru_cache(maxsize=32)
+def feather_window(height: int, width: int, ramp: int) -> np.ndarray:
+    """Per-pixel tile weights that rise from the tile edges to 1 over ``ramp``
+    pixels following a raised cosine. Weights stay positive at the border so
+    tiles without a neighbour are not darkened. The returned array is cached
+    per shape and must not be modified."""
+
+    def _ramp(length: int) -> np.ndarray:
+        distance = np.minimum(np.arange(length), np.arange(length)[::-1]) + 0.5
+        if ramp <= 0:
+            return np.ones(length, dtype=np.float32)
+        t = np.clip(distance / ramp, 0, 1)
+        return (0.5 - 0.5 * np.cos(np.pi * t)).astype(np.float32)
+
+    window = np.outer(_ramp(height), _ramp(width))
+    window.flags.writeable = False
+    return window
+
+
+class FeatherBlend:
+    """Accumulates weighted tile values and weight totals for a mosaic, so
+    overlapping tiles are blended in a single pass without convolutions.
+
+    ``add`` follows the ``rasterio.merge`` method signature and can be passed
+    wherever a merge callable is expected."""
+
+    def __init__(self, shape: tuple[int, int, int], ramp: int):
+        self.ramp = ramp
+        self.weighted_sum = np.zeros(shape, dtype=np.float32)
+        self.weight_total = np.zeros(shape[1:], dtype=np.float32)
+
+    def add(self, merged_data, new_data, merged_mask, new_mask, roff, coff, **kwargs):
+        _, height, width = new_data.shape
+        weights = feather_window(height, width, self.ramp)
+        if new_mask is not np.ma.nomask:
+            weights = np.where(np.all(new_mask, axis=0), 0, weights)
+
+        rows, cols = slice(roff, roff + height), slice(coff, coff + width)
+        self.weighted_sum[:, rows, cols] += new_data * weights
+        self.weight_total[rows, cols] += weights
+
+    def result(self, dtype) -> np.ndarray:
+        mosaic = np.divide(
+            self.weighted_sum,
+            self.weight_total,
+            out=np.zeros_like(self.weighted_sum),
+            where=self.weight_total > 0,
+        )
+        if np.issubdtype(dtype, np.integer):
+            mosaic = np.rint(mosaic)
+        return mosaic.astype(dtype)
+
 
 def smooth_overlap_callable(
     merged_data,
@@ -104,7 +260,8 @@ def smooth_overlap_callable(
 
 
 def copy_smooth(merged_data, new_data, merged_mask, new_mask, sigma=64, **kwargs):
-    """Applies a Gaussian filter to the overlapping pixels."""
+    """Applies a Gaussian filter to the overlapping pixels. Filters every tile
+    in full, prefer the ``"feather"`` merge method for large mosaics."""
     mask = np.empty_like(merged_mask, dtype="bool")
     np.logical_and(merged_mask, new_mask, out=mask)
     np.copyto(
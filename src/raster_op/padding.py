@@ -1,4 +1,3 @@
-import io
 from typing import Generator, Iterable
 
 import numpy as np
@@ -10,7 +9,6 @@ from src.raster_op.utils import (
     create_raster,
     update_bounds,
     update_window_meta,
-    write_image,
 )
 
 from .abstractions import (
@@ -25,25 +23,23 @@ class RasterioRasterPad(RasterOperationStrategy):
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                meta = src.meta.copy()
-                padding_size = self._calculate_padding_size(src.read(), self.padding)
-                image = self._pad_image(src.read(), padding_size)
-
-                adjusted_bounds = self._adjust_bounds_for_padding(
-                    src.bounds, padding_size[0], src.transform
-                )
-                updated_meta = update_window_meta(meta, image)
-                updated_meta = update_bounds(updated_meta, adjusted_bounds)
-                byte_stream = write_image(image, updated_meta)
-
-                yield create_raster(
-                    byte_stream,
-                    image,
-                    adjusted_bounds,
-                    updated_meta,
-                    padding_size[0],
-                )
+            meta = raster.meta
+            padding_size = self._calculate_padding_size(raster.to_numpy(), self.padding)
+            image = self._pad_image(raster.to_numpy(), padding_size)
+
+            adjusted_bounds = self._adjust_bounds_for_padding(
+                raster.bounds, padding_size[0], raster.transform
+            )
+            updated_meta = update_window_meta(meta, image)
+            updated_meta = update_bounds(updated_meta, adjusted_bounds)
+
+            yield create_raster(
+                None,
+                image,
+                adjusted_bounds,
+                updated_meta,
+                padding_size[0],
+            )
 
     def _ensure_divisible_padding(
         self, original_size: int, padding: int, divisible_by: int
@@ -107,20 +103,17 @@ class RasterioRasterPad(RasterOperationStrategy):
 class RasterioRasterUnpad(RasterOperationStrategy):
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                image = src.read()
-                image = self._unpad_image(image, raster.padding_size)
-
-                adjusted_bounds = self._adjust_bounds_for_unpadding(
-                    src.bounds, raster.padding_size, src.transform
-                )
-                updated_meta = update_window_meta(src.meta, image)
-                updated_meta = update_bounds(updated_meta, adjusted_bounds)
-                byte_stream = write_image(image, updated_meta)
-
-                yield create_raster(
-                    byte_stream, image, adjusted_bounds, updated_meta, HeightWidth(0, 0)
-                )
+            image = self._unpad_image(raster.to_numpy(), raster.padding_size)
+
+            adjusted_bounds = self._adjust_bounds_for_unpadding(
+                raster.bounds, raster.padding_size, raster.transform
+            )
+            updated_meta = update_window_meta(raster.meta, image)
+            updated_meta = update_bounds(updated_meta, adjusted_bounds)
+
+            yield create_raster(
+                None, image, adjusted_bounds, updated_meta, HeightWidth(0, 0)
+            )
 
     def _unpad_image(
         self,
@@ -1,13 +1,15 @@
-import io
 from typing import Generator, Iterable, Optional
 
-import rasterio
+import numpy as np
+from rasterio import windows
 from rasterio.crs import CRS
 from rasterio.enums import Resampling
+from rasterio.transform import array_bounds
 from rasterio.warp import calculate_default_transform, reproject
+from shapely.geometry import Polygon
 
 from src.models import Raster
-from src.raster_op.utils import create_raster, write_image
+from src.raster_op.utils import create_raster, geometry_window, mask_geometry
 
 from .abstractions import (
     RasterOperationStrategy,
@@ -29,34 +31,114 @@ class RasterioRasterReproject(RasterOperationStrategy):
         for raster in rasters:
             target_crs = CRS.from_epsg(self.target_crs)
             target_bands = self.target_bands or raster.bands
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                transform, width, height = calculate_default_transform(
-                    src.crs, target_crs, src.width, src.height, *src.bounds
+            image = raster.to_numpy()
+            meta = raster.meta
+            src_crs = meta["crs"]
+            transform, width, height = calculate_default_transform(
+                src_crs,
+                target_crs,
+                meta["width"],
+                meta["height"],
+                *raster.bounds,
+            )
+            meta.update(
+                {
+                    "crs": target_crs,
+                    "transform": transform,
+                    "width": width,
+                    "height": height,
+                }
+            )
+
+            out_image = np.zeros((meta["count"], height, width), dtype=image.dtype)
+            for band in target_bands:
+                reproject(
+                    source=image[band - 1],
+                    destination=out_image[band - 1],
+                    src_transform=raster.transform,
+                    src_crs=src_crs,
+                    dst_transform=transform,
+                    dst_crs=target_crs,
+                    resampling=Resampling[self.resample_alg],
                 )
-                kwargs = src.meta.copy()
-                kwargs.update(
-                    {
-                        "crs": target_crs,
-                        "transform": transform,
-                        "width": width,
-                        "height": height,
-                    }
+
+            yield create_raster(
+                None,
+                out_image,
+                array_bounds(height, width, transform),
+                meta,
+                raster.padding_size,
+            )
+
+
+class RasterioReprojectClip(RasterOperationStrategy):
+    """Reproject and clip to ``geometry`` in one pass.
+
+    Uses the grid of ``RasterioRasterReproject`` followed by ``RasterioClip``
+    with ``crop=True``, but only the window of it covering ``geometry`` is
+    warped, so the cost scales with the geometry instead of the scene.
+    Pixel values match except where GDAL breaks nearest neighbour ties
+    differently for the window, well under 1% of the pixels.
+    ``geometry`` is in ``target_crs``.
+    """
+
+    def __init__(
+        self,
+        geometry: Polygon,
+        target_crs: int,
+        target_bands: Optional[Iterable[int]] = None,
+        resample_alg: str = "nearest",
+    ):
+        self.geometry = geometry
+        self.target_crs = target_crs
+        self.target_bands = target_bands
+        self.resample_alg = resample_alg
+
+    def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
+        for raster in rasters:
+            target_crs = CRS.from_epsg(self.target_crs)
+            target_bands = self.target_bands or raster.bands
+            image = raster.to_numpy()
+            meta = raster.meta
+            src_crs = meta["crs"]
+            scene_transform, scene_width, scene_height = calculate_default_transform(
+                src_crs,
+                target_crs,
+                meta["width"],
+                meta["height"],
+                *raster.bounds,
+            )
+            window = geometry_window(
+                self.geometry, (scene_height, scene_width), scene_transform
+            )
+            transform = windows.transform(window, scene_transform)
+            height, width = int(window.height), int(window.width)
+            meta.update(
+                {
+                    "crs": target_crs,
+                    "transform": transform,
+                    "width": width,
+                    "height": height,
+                }
+            )
+
+            out_image = np.zeros((meta["count"], height, width), dtype=image.dtype)
+            for band in target_bands:
+                reproject(
+                    source=image[band - 1],
+                    destination=out_image[band - 1],
+                    src_transform=raster.transform,
+                    src_crs=src_crs,
+                    dst_transform=transform,
+                    dst_crs=target_crs,
+                    resampling=Resampling[self.resample_alg],
                 )
+            out_image = mask_geometry(out_image, self.geometry, transform)
 
-                with rasterio.open(io.BytesIO(raster.content), "w", **kwargs) as dst:
-                    for band in target_bands:
-                        reproject(
-                            source=rasterio.band(src, band),
-                            destination=rasterio.band(dst, band),
-                            dst_transform=transform,
-                            dst_crs=target_crs,
-                            resampling=Resampling[self.resample_alg],
-                        )
-
-                    yield create_raster(
-                        write_image(dst.read(), dst.meta),
-                        dst.read(),
-                        dst.bounds,
-                        dst.meta,
-                        raster.padding_size,
-                    )
+            yield create_raster(
+                None,
+                out_image,
+                array_bounds(height, width, transform),
+                meta,
+                raster.padding_size,
+            )
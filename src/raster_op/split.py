@@ -1,9 +1,8 @@
-import io
 from itertools import product
 from typing import Generator, Iterable
 
 import numpy as np
-import rasterio
+from rasterio import windows
 from rasterio.windows import Window
 
 from src._types import HeightWidth
@@ -12,7 +11,6 @@ from src.raster_op.utils import (
     create_raster,
     update_bounds,
     update_window_meta,
-    write_image,
 )
 
 from .abstractions import (
@@ -31,38 +29,35 @@ class RasterioRasterSplit(RasterOperationStrategy):
 
     def execute(self, rasters: Iterable[Raster]) -> Generator[Raster, None, None]:
         for raster in rasters:
-            with rasterio.open(io.BytesIO(raster.content)) as src:
-                meta = src.meta.copy()
-                for window, src in self._generate_windows(
-                    raster, self.image_size, self.offset
-                ):
-                    image = src.read(window=window)
-                    window_meta = update_window_meta(meta, image)
-                    window_meta = update_bounds(window_meta, src.window_bounds(window))
-                    window_byte_stream = write_image(image, window_meta)
-
-                    yield create_raster(
-                        window_byte_stream,
-                        image,
-                        src.window_bounds(window),
-                        window_meta,
-                        raster.padding_size,
-                    )
+            meta = raster.meta
+            array = raster.to_numpy()
+            for window in self._generate_windows(raster, self.image_size, self.offset):
+                image = array[(slice(None), *window.toslices())]
+                window_bounds = windows.bounds(window, raster.transform)
+                window_meta = update_window_meta(meta, image)
+                window_meta = update_bounds(window_meta, window_bounds)
+
+                yield create_raster(
+                    None,
+                    image,
+                    window_bounds,
+                    window_meta,
+                    raster.padding_size,
+                )
 
     def _generate_windows(self, raster: Raster, image_size, offset):
-        with rasterio.open(io.BytesIO(raster.content)) as src:
-            meta = src.meta.copy()
-            rows = np.arange(0, meta["height"], image_size[0])
-            cols = np.arange(0, meta["width"], image_size[1])
-            image_window = Window(0, 0, meta["width"], meta["height"])  # type: ignore
-
-            for r, c in product(rows, cols):
-                window = image_window.intersection(
-                    Window(
-                        c - offset,  # type: ignore
-                        r - offset,
-                        image_size[1] + offset,
-                        image_size[0] + offset,
-                    )
+        _, height, width = raster.to_numpy().shape
+        rows = np.arange(0, height, image_size[0])
+        cols = np.arange(0, width, image_size[1])
+        image_window = Window(0, 0, width, height)  # type: ignore
+
+        for r, c in product(rows, cols):
+            window = image_window.intersection(
+                Window(
+                    c - offset,  # type: ignore
+                    r - offset,
+                    image_size[1] + offset,
+                    image_size[0] + offset,
                 )
-                yield window, src
+            )
+            yield window
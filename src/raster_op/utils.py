@@ -1,9 +1,15 @@
 import io
 import logging
+import math
+from typing import Optional
 
 import numpy as np
 import rasterio
+from rasterio import features
+from rasterio.errors import WindowError
+from rasterio.windows import Window
 from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
 
 from src._types import BoundingBox, HeightWidth
 from src.models import DownloadResponse, Raster
@@ -21,6 +27,33 @@ def update_bounds(meta, new_bounds: BoundingBox) -> dict:
     return meta
 
 
+def geometry_window(
+    geometry: BaseGeometry, shape: tuple[int, int], transform: rasterio.Affine
+) -> Window:
+    """Window of a raster of ``shape`` covering the bounds of ``geometry``,
+    rounded outwards to whole pixels."""
+    left, bottom, right, top = features.bounds(geometry, transform=~transform)
+    row_start, row_stop = math.floor(min(top, bottom)), math.ceil(max(top, bottom))
+    col_start, col_stop = math.floor(min(left, right)), math.ceil(max(left, right))
+    window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    try:
+        return window.intersection(Window(0, 0, shape[1], shape[0]))
+    except WindowError as e:
+        raise ValueError("Input shapes do not overlap raster.") from e
+
+
+def mask_geometry(
+    image: np.ndarray, geometry: BaseGeometry, transform: rasterio.Affine
+) -> np.ndarray:
+    """Copy of ``image`` with the pixels outside ``geometry`` set to 0."""
+    shape_mask = features.geometry_mask(
+        [geometry], out_shape=image.shape[1:], transform=transform
+    )
+    out_image = image.copy()
+    out_image[:, shape_mask] = 0
+    return out_image
+
+
 def update_window_meta(meta, image: np.ndarray) -> dict:
     window_meta = meta.copy()
     window_meta.update(
@@ -34,12 +67,14 @@ def update_window_meta(meta, image: np.ndarray) -> dict:
 
 
 def create_raster(
-    content: bytes,
+    content: Optional[bytes],
     image: np.ndarray,
     bounds: BoundingBox,
     meta: dict,
     padding_size: HeightWidth,
 ) -> Raster:
+    """Create a raster backed by ``image``. When ``content`` is None the
+    GeoTIFF bytes are only encoded once they are accessed."""
     bands = [i + 1 for i in range(image.shape[0])]
 
     return Raster(
@@ -51,6 +86,8 @@ def create_raster(
         resolution=(meta["transform"].a),
         geometry=box(*bounds),
         padding_size=padding_size,
+        array=image,
+        transform=meta["transform"],
     )
 
 
@@ -62,6 +99,42 @@ def write_image(image: np.ndarray, meta: dict) -> bytes:
     return buffer.getvalue()
 
 
+def write_cog(
+    image: np.ndarray,
+    meta: dict,
+    compress: str = "ZSTD",
+    blocksize: int = 512,
+    overview_resampling: str = "average",
+) -> bytes:
+    """Encode ``image`` as a cloud-optimized GeoTIFF: tiled in ``blocksize``
+    blocks, compressed with a predictor matching the dtype and with overviews
+    down to a single block, so readers can fetch windows and zoom levels with
+    range requests."""
+    predictor = 3 if np.issubdtype(image.dtype, np.floating) else 2
+    profile = {
+        **meta,
+        "driver": "COG",
+        "compress": compress,
+        "predictor": predictor,
+        "blocksize": blocksize,
+        "overviews": "AUTO",
+        "overview_resampling": overview_resampling,
+    }
+    with rasterio.MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(image)
+        return memfile.read()
+
+
+def to_cog(content: bytes, **kwargs) -> bytes:
+    """Convert GeoTIFF ``content`` to a cloud-optimized GeoTIFF, ``kwargs``
+    are passed to ``write_cog``."""
+    with rasterio.open(io.BytesIO(content)) as src:
+        image = src.read()
+        meta = src.meta.copy()
+    return write_cog(image, meta, **kwargs)
+
+
 def create_raster_from_download_response(image: DownloadResponse) -> Raster:
     with rasterio.open(io.BytesIO(image.content)) as src:
         np_image = src.read().copy()
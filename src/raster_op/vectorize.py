@@ -1,12 +1,11 @@
-import io
 from typing import Generator, Optional
 
 import numpy as np
-import rasterio
+from pyproj import Transformer
 from rasterio.features import shapes
-from shapely.geometry import Point, Polygon
+from shapely.geometry import Polygon
 
-from src.models import Raster, Vector
+from src.models import Raster, Vector, VectorBatch
 
 from .abstractions import (
     RasterToVectorStrategy,
@@ -14,36 +13,49 @@ from .abstractions import (
 
 
 class RasterioRasterToPoint(RasterToVectorStrategy):
-    def __init__(self, band: int = 1, threshold: Optional[int] = None):
+    def __init__(
+        self,
+        band: int = 1,
+        threshold: Optional[int] = None,
+        target_crs: Optional[int] = None,
+    ):
         """
         :param band: The band to use for the conversion
         :param threshold: Pixels with values below this threshold will be ignored
+        :param target_crs: Transform the pixel centers to this CRS, which is
+            cheaper than reprojecting the raster before the conversion
         """
         self.band = band
         self.threshold = threshold
+        self.target_crs = target_crs
 
     def execute(self, raster: Raster) -> Generator[Vector, None, None]:
-        with rasterio.open(io.BytesIO(raster.content)) as src:
-            image = src.read(self.band)
-            meta = src.meta.copy()
+        yield from self.execute_batch(raster)
 
-            transform = src.transform
+    def execute_batch(self, raster: Raster) -> VectorBatch:
+        image = raster.to_numpy()[self.band - 1]
+        transform = raster.transform
 
-            if not np.issubdtype(image.dtype, np.integer):
-                raise NotImplementedError(
-                    "Raster to vector conversion only supported for integer data types"
-                )
+        if not np.issubdtype(image.dtype, np.integer):
+            raise NotImplementedError(
+                "Raster to vector conversion only supported for integer data types"
+            )
 
-            for (row, col), value in np.ndenumerate(image):
-                if self.threshold is not None and value <= self.threshold:
-                    continue
-                x, y = transform * (col + 0.5, row + 0.5)
+        if self.threshold is None:
+            rows, cols = np.indices(image.shape).reshape(2, -1)
+        else:
+            rows, cols = np.nonzero(image > self.threshold)
+        xs, ys = transform * (cols + 0.5, rows + 0.5)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
 
-                yield Vector(
-                    pixel_value=round(value),
-                    geometry=Point(x, y),
-                    crs=meta["crs"].to_epsg(),
-                )
+        crs = raster.crs
+        if self.target_crs is not None and self.target_crs != crs:
+            transformer = Transformer.from_crs(crs, self.target_crs, always_xy=True)
+            xs, ys = transformer.transform(xs, ys)
+            crs = self.target_crs
+
+        return VectorBatch.from_points(xs, ys, image[rows, cols], crs)
 
 
 class RasterioRasterToPolygon(RasterToVectorStrategy):
@@ -56,20 +68,18 @@ class RasterioRasterToPolygon(RasterToVectorStrategy):
         self.threshold = threshold
 
     def execute(self, raster: Raster) -> Generator[Vector, None, None]:
-        with rasterio.open(io.BytesIO(raster.content)) as src:
-            image = src.read(self.band)
-            meta = src.meta.copy()
-            if not np.issubdtype(image.dtype, np.integer):
-                raise NotImplementedError(
-                    "Raster to vector conversion only supported for integer data types"
-                )
-
-            for geom, value in shapes(image, transform=src.transform):
-                if value <= self.threshold:
-                    continue
-
-                yield Vector(
-                    pixel_value=round(value),
-                    geometry=Polygon(geom["coordinates"][0]),
-                    crs=meta["crs"].to_epsg(),
-                )
+        image = raster.to_numpy()[self.band - 1]
+        if not np.issubdtype(image.dtype, np.integer):
+            raise NotImplementedError(
+                "Raster to vector conversion only supported for integer data types"
+            )
+
+        for geom, value in shapes(image, transform=raster.transform):
+            if value <= self.threshold:
+                continue
+
+            yield Vector(
+                pixel_value=round(value),
+                geometry=Polygon(geom["coordinates"][0]),
+                crs=raster.crs,
+            )
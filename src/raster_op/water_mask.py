@@ -0,0 +1,88 @@
+import functools
+import logging
+from collections.abc import Sequence
+
+import fiona
+import numpy as np
+import shapely
+from rasterio import features
+from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+
+from src.geo_utils import reproject_geometry
+from src.models import Raster
+
+LOGGER = logging.getLogger(__name__)
+
+OCEAN_MASK_PATH = "assets/ne_10m_ocean/ne_10m_ocean.shp"
+GRID_CELL_DEGREES = 10
+
+
+class WaterMask:
+    """Water polygons in EPSG:4326, indexed with an STRtree so only the
+    polygons overlapping a scene are clipped and rasterized to its grid.
+
+    With the Natural Earth ocean polygons, rivers, lakes and most estuaries
+    count as land."""
+
+    def __init__(self, geometries: Sequence[BaseGeometry]):
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def rasterize(self, raster: Raster, buffer: float = 0) -> np.ndarray:
+        """Boolean array of the raster's shape that is True for pixels
+        touching water. The water polygons are grown by ``buffer`` in units
+        of the raster's CRS to absorb the inaccuracy of the coastline."""
+        _, height, width = raster.to_numpy().shape
+        bounds = raster.bounds
+        scene = reproject_geometry(box(*bounds), raster.crs, 4326)
+        candidates = self.geometries[self.tree.query(scene, predicate="intersects")]
+        if not len(candidates):
+            return np.zeros((height, width), dtype=bool)
+
+        minx, miny, maxx, maxy = scene.bounds
+        # clip with a margin so the buffer is not cut off at the scene edge
+        margin = max(maxx - minx, maxy - miny)
+        water = shapely.clip_by_rect(
+            candidates, minx - margin, miny - margin, maxx + margin, maxy + margin
+        )
+        water = [
+            reproject_geometry(geometry, 4326, raster.crs)
+            for geometry in water
+            if not geometry.is_empty
+        ]
+        if buffer:
+            water = list(shapely.buffer(water, buffer))
+        if not water:
+            return np.zeros((height, width), dtype=bool)
+        return features.rasterize(
+            water,
+            out_shape=(height, width),
+            transform=raster.transform,
+            all_touched=True,
+            dtype="uint8",
+        ).astype(bool)
+
+
+@functools.lru_cache
+def load_water_mask(path: str = OCEAN_MASK_PATH) -> WaterMask:
+    """Read the polygons of a shapefile in EPSG:4326, e.g. the Natural Earth
+    ocean polygons, once per process. The ``.shp`` of those is not part of
+    the repository and has to be downloaded into ``assets/ne_10m_ocean``."""
+    with fiona.open(path) as src:
+        geometries = [shapely.geometry.shape(feature.geometry) for feature in src]
+    pieces = _split_by_grid(geometries, GRID_CELL_DEGREES)
+    LOGGER.info(f"Loaded {len(pieces)} water polygon pieces from {path}")
+    return WaterMask(pieces)
+
+
+def _split_by_grid(geometries: Sequence[BaseGeometry], cell: int) -> list:
+    """Cut ``geometries`` along a ``cell`` degree grid. The Natural Earth
+    oceans are a few polygons with a huge number of vertices each, the
+    pieces keep clipping them to a scene cheap."""
+    pieces = []
+    for x in range(-180, 180, cell):
+        for y in range(-90, 90, cell):
+            clipped = shapely.clip_by_rect(geometries, x, y, x + cell, y + cell)
+            pieces.extend(piece for piece in clipped if not piece.is_empty)
+    return pieces
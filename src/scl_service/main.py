@@ -80,15 +80,18 @@ def main():
                 comp_op.add(RasterioRasterReproject(target_crs=4326))
                 comp_op.add(RasterioClip(aoi_geom))
                 clipped_scl_raster = next(comp_op.execute([scl_raster]))
-                scl_vectors = list(
-                    RasterioRasterToPolygon(band=1).execute(clipped_scl_raster)
+                scl_vectors = RasterioRasterToPolygon(band=1).execute_batch(
+                    clipped_scl_raster
                 )
 
                 inserter = Insert(db)
 
-                inserter.insert_scls_vectors(vectors=scl_vectors, image_id=image.id)
+                counts = inserter.bulk_insert_scls_vectors(
+                    vectors=scl_vectors, image_id=image.id
+                )
                 LOGGER.info(
-                    f"Inserted {len(scl_vectors)} SCL vectors for image {image.id}"
+                    f"Inserted {counts.inserted} SCL vectors for image {image.id}, "
+                    f"skipped {counts.skipped} duplicates"
                 )
 
 
@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Iterable
 
-from src.models import Vector
+from src.models import Vector, VectorBatch
 
 
 def pixelvalue_to_probability(pixelvalue: int) -> float:
@@ -17,6 +17,10 @@ class VectorOperationStrategy(ABC):
     def execute(self, vectors: Iterable[Vector]) -> Iterable[Vector]:
         pass
 
+    def execute_batch(self, batch: VectorBatch) -> VectorBatch:
+        """Apply the operation to a whole ``VectorBatch``."""
+        return VectorBatch.from_vectors(self.execute(batch), batch.crs)
+
 
 class VectorFilter(VectorOperationStrategy):
     def __init__(self, threshold: int):
@@ -26,3 +30,6 @@ class VectorFilter(VectorOperationStrategy):
         for vector in vectors:
             if vector.pixel_value > self.threshold:
                 yield vector
+
+    def execute_batch(self, batch: VectorBatch) -> VectorBatch:
+        return batch.filter(batch.pixel_values > self.threshold)
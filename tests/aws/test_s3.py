@@ -0,0 +1,43 @@
+import io
+import threading
+
+import pytest
+
+from src.aws import s3
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.uploads = {}
+        self.threads = set()
+
+    def upload_fileobj(self, data_stream, bucket_name, object_name, Config=None):
+        assert Config is s3.TRANSFER_CONFIG
+        self.uploads[f"{bucket_name}/{object_name}"] = data_stream.read()
+        self.threads.add(threading.current_thread().name)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeS3Client()
+    monkeypatch.setitem(s3._state, "client", client)
+    yield client
+    s3.shutdown_uploads()
+
+
+def test_get_client_is_shared(fake_client):
+    assert s3.get_client() is fake_client
+    assert s3.get_client() is s3.get_client()
+
+
+def test_stream_to_s3_async(fake_client):
+    futures = [
+        s3.stream_to_s3_async(io.BytesIO(bytes([i])), "bucket", f"key_{i}")
+        for i in range(3)
+    ]
+
+    assert [future.result() for future in futures] == [
+        f"s3://bucket/key_{i}" for i in range(3)
+    ]
+    assert fake_client.uploads == {f"bucket/key_{i}": bytes([i]) for i in range(3)}
+    assert all(name.startswith("s3-upload") for name in fake_client.threads)
@@ -0,0 +1,19 @@
+from src import config
+from src.database import connect
+
+
+def test_engine_is_shared_and_disposed():
+    connect.dispose_engine()
+
+    engine = connect.get_engine()
+    session = connect.create_db_session()
+
+    assert connect.get_engine() is engine
+    assert session.get_bind() is engine
+    assert engine.pool.size() == config.DB_POOL_SIZE
+    assert engine.pool._pre_ping == config.DB_POOL_PRE_PING
+    session.close()
+
+    connect.dispose_engine()
+    assert connect.get_engine() is not engine
+    connect.dispose_engine()
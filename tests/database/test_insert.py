@@ -1,17 +1,30 @@
 import datetime
+from concurrent.futures import Future
 
+import numpy as np
 import psycopg2
 import pytest
+import shapely
 from geoalchemy2.shape import from_shape
-from shapely.geometry import Point
+from shapely.geometry import Point, box
 from shapely.geometry.polygon import Polygon
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import Session, create_session
 from sqlalchemy_utils import create_database, database_exists, drop_database
 
-from src._types import HeightWidth
-from src.database.insert import Insert
+from src._types import BoundingBox, HeightWidth, SceneKey
+from src.database.insert import (
+    ImageInsert,
+    Insert,
+    InsertJob,
+    SceneUploads,
+    _copy_buffer,
+    delete_job_prediction_vectors,
+    images_in_db,
+    scene_dedupe_key,
+    scene_key,
+)
 from src.database.models import (
     AOI,
     Base,
@@ -23,8 +36,10 @@ from src.database.models import (
     PredictionRaster,
     PredictionVector,
     SceneClassificationVector,
+    image_dedupe_key,
 )
-from src.models import DownloadResponse, Raster, Vector
+from src.database.partition import JOB, MONTH, partition_name, partitioned_table_ddl
+from src.models import DownloadResponse, Raster, Vector, VectorBatch
 from tests.conftest import TEST_AOI_POLYGON
 
 DB_NAME = "oew_test"
@@ -86,6 +101,14 @@ def mock_session():
         def bulk_save_objects(self, objs):
             self.queries.extend(objs)
 
+        def execute(self, statement):
+            # job id and timestamp of the image a prediction raster belongs to
+            return MockResult()
+
+    class MockResult:
+        def one(self):
+            return 1, datetime.datetime(2021, 1, 1)
+
     return MockSession()
 
 
@@ -196,7 +219,7 @@ def test_insert_mock_session(
     )
     mock_session.add(job)
     mock_session.commit()
-    image = insert.insert_image(
+    image, _ = insert.insert_image(
         download_response, db_raster, "test_image_url", job.id, 1
     )
 
@@ -229,6 +252,350 @@ def test_insert_mock_session(
     assert scls_vectors[0].image_id == image.id
 
 
+def test_insert_all_waits_for_uploads(
+    mock_session, download_response, db_raster, db_vectors
+):
+    image_url, pred_raster_url = Future(), Future()
+    image_url.set_result("s3://bucket/image.tif")
+    pred_raster_url.set_result("s3://bucket/prediction.tif")
+
+    image, raster, count = InsertJob(Insert(mock_session)).insert_all(
+        job_id=1,
+        satellite_id=1,
+        model_name="test_model_id",
+        download_response=download_response,
+        image=db_raster,
+        pred_raster=db_raster,
+        vectors=db_vectors,
+        uploads=SceneUploads(image_url, pred_raster_url),
+    )
+
+    assert image.image_url == "s3://bucket/image.tif"
+    assert raster.raster_url == "s3://bucket/prediction.tif"
+    assert count == 1
+    assert mock_session.queries[:2] == [image, raster]
+    vector = mock_session.queries[2]
+    assert (vector.job_id, vector.image_timestamp) == (
+        1,
+        datetime.datetime(2021, 1, 1),
+    )
+
+
+def test_insert_all_uses_transformed_raster(
+    mock_session, download_response, db_raster, db_vectors
+):
+    image_url, pred_raster_url, transformed = Future(), Future(), Future()
+    image_url.set_result("s3://bucket/image.tif")
+    pred_raster_url.set_result("s3://bucket/prediction.tif")
+    transformed.set_result(
+        Raster(
+            content=b"test_content",
+            size=HeightWidth(height=5, width=5),
+            dtype="uint8",
+            crs=4326,
+            bands=[1],
+            resolution=20.0,
+            geometry=db_raster.geometry,
+        )
+    )
+
+    _, raster, _ = InsertJob(Insert(mock_session)).insert_all(
+        job_id=1,
+        satellite_id=1,
+        model_name="test_model_id",
+        download_response=download_response,
+        image=db_raster,
+        pred_raster=db_raster,
+        vectors=db_vectors,
+        uploads=SceneUploads(image_url, pred_raster_url, transformed),
+    )
+
+    assert (raster.image_width, raster.image_height) == (5, 5)
+
+
+def test_upload_transforms_raster_in_upload_task(
+    download_response, db_raster, monkeypatch
+):
+    uploaded = {}
+
+    def upload(value, object_name):
+        uploaded[object_name] = value
+        return f"s3://bucket/{object_name}"
+
+    monkeypatch.setattr("src.database.insert.upload_image", upload)
+    monkeypatch.setattr("src.database.insert.upload_raster", upload)
+    transformed = Raster(
+        content=b"test_content",
+        size=HeightWidth(height=5, width=5),
+        dtype="uint8",
+        crs=4326,
+        bands=[1],
+        resolution=20.0,
+        geometry=db_raster.geometry,
+    )
+
+    uploads = InsertJob.upload(
+        "model", download_response, db_raster, transform=lambda raster: transformed
+    )
+
+    url = uploads.pred_raster_url.result()
+    assert uploads.pred_raster.result() is transformed
+    assert uploaded[url.removeprefix("s3://bucket/")] is transformed
+
+    def fail(raster):
+        raise ValueError("no overlap")
+
+    failed = InsertJob.upload("model", download_response, db_raster, transform=fail)
+    with pytest.raises(ValueError):
+        failed.pred_raster.result()
+    with pytest.raises(ValueError):
+        failed.pred_raster_url.result()
+
+
+def test_upload_encodes_image_raster_in_upload_task(
+    download_response, db_raster, monkeypatch
+):
+    uploaded = {}
+
+    def upload(value, object_name, *args):
+        uploaded[object_name] = value
+        return f"s3://bucket/{object_name}"
+
+    monkeypatch.setattr("src.database.insert.upload_image", upload)
+    monkeypatch.setattr("src.database.insert.upload_raster", upload)
+
+    uploads = InsertJob.upload("model", download_response, db_raster, image=db_raster)
+
+    url = uploads.image_url.result()
+    assert uploaded[url.removeprefix("s3://bucket/")] is db_raster
+
+
+def test_insert_image_dedupe_key_from_requested_bbox(
+    mock_session, download_response, db_raster
+):
+    download_response.bbox = BoundingBox(5, 5, 6, 6)
+
+    image, inserted = Insert(mock_session).insert_image(
+        download_response, db_raster, "test_image_url", 1, 1
+    )
+
+    assert inserted
+    assert image.dedupe_key == scene_dedupe_key(scene_key(download_response), 1)
+    assert image.dedupe_key != image_dedupe_key(
+        image.image_id, image.timestamp, db_raster.geometry, 1
+    )
+
+
+def test_insert_all_skips_predictions_of_stored_image(
+    mock_session, download_response, db_raster, db_vectors, monkeypatch
+):
+    image_url, pred_raster_url = Future(), Future()
+    image_url.set_result("s3://bucket/image.tif")
+    pred_raster_url.set_result("s3://bucket/prediction.tif")
+    insert = Insert(mock_session)
+    stored = Image(
+        satellite_id=1,
+        image_id=download_response.image_id,
+        image_url="s3://bucket/image.tif",
+        timestamp=download_response.timestamp,
+        dtype="uint8",
+        crs=4326,
+        resolution=10.0,
+        image_width=10,
+        image_height=10,
+        bbox=db_raster.geometry,
+        job_id=1,
+    )
+    monkeypatch.setattr(
+        insert, "insert_image", lambda *args: ImageInsert(stored, False)
+    )
+
+    image, raster, count = InsertJob(insert).insert_all(
+        job_id=1,
+        satellite_id=1,
+        model_name="test_model_id",
+        download_response=download_response,
+        image=db_raster,
+        pred_raster=db_raster,
+        vectors=db_vectors,
+        uploads=SceneUploads(image_url, pred_raster_url),
+    )
+
+    assert image is stored
+    assert raster is None
+    assert count == 0
+    assert mock_session.queries == []
+
+
+def test_copy_buffer():
+    batch = VectorBatch.from_points(
+        np.array([1.0, 2.0]), np.array([3.0, 4.0]), np.array([10, 20]), crs=4326
+    )
+
+    rows = [row.split("\t") for row in _copy_buffer(batch, 7).read().splitlines()]
+
+    assert [(int(value), int(raster_id)) for value, _, raster_id in rows] == [
+        (10, 7),
+        (20, 7),
+    ]
+    geometries = shapely.from_wkb([ewkb for _, ewkb, _ in rows])
+    assert shapely.get_srid(geometries).tolist() == [4326, 4326]
+    assert geometries.tolist() == [Point(1, 3), Point(2, 4)]
+
+
+def test_copy_prediction_vectors_falls_back_to_orm(mock_session, db_vectors):
+    count = Insert(mock_session).copy_prediction_vectors(db_vectors, 1)
+
+    assert count == 1
+    assert isinstance(mock_session.queries[0], PredictionVector)
+
+
+def test_bulk_insert_scls_vectors_falls_back_to_orm(mock_session, db_scls_vectors):
+    counts = Insert(mock_session).bulk_insert_scls_vectors(db_scls_vectors, 1)
+
+    assert counts == (1, 0)
+    assert isinstance(mock_session.queries[0], SceneClassificationVector)
+
+
+@pytest.mark.integration
+def test_bulk_insert_scls_vectors_skips_duplicates(
+    test_session, download_response, db_raster, db_scls_vectors, aoi, model, job
+):
+    insert = Insert(test_session)
+    image, _ = insert.insert_image(
+        download_response, db_raster, "test_image_url", job.id, 1
+    )
+    other = Vector(
+        geometry=Polygon([(0, 0), (0, 2), (2, 2), (2, 0)]), pixel_value=2, crs=4326
+    )
+
+    first = insert.bulk_insert_scls_vectors(db_scls_vectors * 2, image.id)
+    second = insert.bulk_insert_scls_vectors(db_scls_vectors + [other], image.id)
+
+    assert first == (1, 1)
+    assert second == (1, 1)
+    assert test_session.query(SceneClassificationVector).count() == 2
+
+
+@pytest.mark.integration
+def test_images_in_db(test_session, download_response, db_raster, aoi, model, job):
+    Insert(test_session).insert_image(
+        download_response, db_raster, "test_image_url", job.id, 1
+    )
+    # looked up by the requested bbox, which differs from the raster's
+    stored = SceneKey(
+        download_response.image_id,
+        download_response.timestamp,
+        BoundingBox(*download_response.bbox),
+        download_response.crs,
+    )
+    other = stored._replace(image_id="other")
+
+    assert images_in_db(test_session, [stored, other], job.id) == {stored}
+    assert images_in_db(test_session, [stored], job.id + 1) == set()
+
+
+@pytest.mark.integration
+def test_insert_image_skips_duplicate(
+    test_session, download_response, db_raster, aoi, model, job
+):
+    insert = Insert(test_session)
+    image, _ = insert.insert_image(
+        download_response, db_raster, "test_image_url", job.id, 1
+    )
+    duplicate, inserted = insert.insert_image(
+        download_response, db_raster, "other_image_url", job.id, 1
+    )
+
+    assert not inserted
+    assert duplicate.id == image.id
+    assert duplicate.image_url == "test_image_url"
+    assert test_session.query(Image).count() == 1
+
+
+def test_image_dedupe_key():
+    timestamp = datetime.datetime(2021, 1, 1)
+    bbox = Polygon([(10.1, 50.2), (10.1, 50.4), (10.3, 50.4), (10.3, 50.2)])
+    noisy = shapely.transform(bbox, lambda c: c + 1e-10)
+    reordered = Polygon([(10.3, 50.2), (10.1, 50.2), (10.1, 50.4), (10.3, 50.4)])
+    key = image_dedupe_key("S2A", timestamp, bbox, 1)
+
+    assert len(key) == 64
+    assert image_dedupe_key("S2A", timestamp, noisy, 1) == key
+    assert image_dedupe_key("S2A", timestamp, reordered, 1) == key
+    assert (
+        image_dedupe_key("S2A", timestamp.replace(tzinfo=datetime.UTC), bbox, 1) == key
+    )
+    assert image_dedupe_key("S2B", timestamp, bbox, 1) != key
+    assert image_dedupe_key("S2A", timestamp, bbox, 2) != key
+    assert image_dedupe_key("S2A", timestamp, box(10, 50, 10.3, 50.4), 1) != key
+
+
+@pytest.mark.integration
+def test_copy_prediction_vectors(
+    test_session, download_response, db_raster, aoi, model, job
+):
+    insert = Insert(test_session)
+    image, _ = insert.insert_image(
+        download_response, db_raster, "test_image_url", job.id, 1
+    )
+    raster = insert.insert_prediction_raster(db_raster, image.id, "test_raster_url")
+    batch = VectorBatch.from_points(
+        np.arange(250, dtype=float),
+        np.zeros(250),
+        np.arange(250),
+        crs=4326,
+    )
+
+    count = insert.copy_prediction_vectors(batch, raster.id, chunk_size=100)
+
+    assert count == 250
+    vectors = test_session.query(PredictionVector).all()
+    assert len(vectors) == 250
+    assert {vector.prediction_raster_id for vector in vectors} == {raster.id}
+    assert sorted(vector.pixel_value for vector in vectors) == list(range(250))
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("partition_by", [JOB, MONTH])
+def test_copy_prediction_vectors_partitioned(
+    create_test_db,
+    test_session,
+    download_response,
+    db_raster,
+    db_vectors,
+    aoi,
+    model,
+    job,
+    partition_by,
+):
+    table = PredictionVector.__table__
+    table.drop(create_test_db)
+    with create_test_db.begin() as conn:
+        conn.execute(
+            text(partitioned_table_ddl(table, partition_by, create_test_db.dialect))
+        )
+    insert = Insert(test_session, partition_by)
+    image, _ = insert.insert_image(
+        download_response, db_raster, "test_image_url", job.id, 1
+    )
+    raster = insert.insert_prediction_raster(db_raster, image.id, "test_raster_url")
+
+    count = insert.copy_prediction_vectors(db_vectors, raster.id)
+
+    partition = partition_name(table.name, partition_by, job.id, image.timestamp)
+    assert count == 1
+    assert (
+        test_session.execute(text(f"SELECT count(*) FROM {partition}")).scalar_one()
+        == 1
+    )
+    vector = test_session.query(PredictionVector).one()
+    assert (vector.job_id, vector.image_timestamp) == (job.id, image.timestamp)
+
+    delete_job_prediction_vectors(test_session, job.id, partition_by)
+    assert test_session.query(PredictionVector).count() == 0
+
+
 @pytest.mark.integration
 def test_image_invalid_dtype(test_session, aoi, model, job):
     test_session.add(aoi)
@@ -333,7 +700,9 @@ def test_insert_db(
         (datetime.datetime.now() - datetime.timedelta(days=1), datetime.datetime.now()),
         0.1,
     )
-    image = insert.insert_image(download_response, db_raster, "test_image_url", job.id)
+    image, _ = insert.insert_image(
+        download_response, db_raster, "test_image_url", job.id
+    )
     raster = insert.insert_prediction_raster(db_raster, image.id, "test_raster_url")
     insert.insert_prediction_vectors(
         db_vectors,
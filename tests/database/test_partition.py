@@ -0,0 +1,36 @@
+import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.database.models import PredictionVector
+from src.database.partition import JOB, MONTH, partition_name, partitioned_table_ddl
+
+
+@pytest.mark.parametrize(
+    "partition_by, key, method",
+    [(JOB, "job_id", "LIST"), (MONTH, "image_timestamp", "RANGE")],
+)
+def test_partitioned_table_ddl(partition_by, key, method):
+    ddl = partitioned_table_ddl(
+        PredictionVector.__table__, partition_by, postgresql.dialect()
+    )
+
+    assert ddl.startswith("CREATE TABLE prediction_vectors (")
+    assert f"PRIMARY KEY (id, {key})" in ddl
+    assert "REFERENCES prediction_rasters (id)" in ddl
+    assert "geometry geometry(POINT,4326) NOT NULL" in ddl
+    assert ddl.endswith(f"PARTITION BY {method} ({key})")
+
+
+def test_partition_name():
+    timestamp = datetime.datetime(2023, 12, 31, 23, 59)
+
+    assert partition_name("prediction_vectors", JOB, job_id=7) == (
+        "prediction_vectors_job_7"
+    )
+    assert partition_name("prediction_vectors", MONTH, timestamp=timestamp) == (
+        "prediction_vectors_2023_12"
+    )
+    with pytest.raises(ValueError):
+        partition_name("prediction_vectors", "day", timestamp=timestamp)
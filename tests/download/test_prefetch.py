@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from src.download.prefetch import prefetch
+
+
+def test_prefetch_yields_items_in_order():
+    items = [b"a" * i for i in range(10)]
+
+    assert list(prefetch(items, max_items=3, max_bytes=8)) == items
+
+
+def test_prefetch_is_bounded():
+    produced = []
+    lock = threading.Lock()
+
+    def items():
+        for i in range(10):
+            with lock:
+                produced.append(i)
+            yield b"x" * 4
+
+    iterator = prefetch(items(), max_items=5, max_bytes=8)
+    next(iterator)
+    time.sleep(0.1)
+
+    # two items of 4 bytes fit the buffer, a third was fetched and waits
+    with lock:
+        assert len(produced) == 4
+    assert len(list(iterator)) == 9
+
+
+def test_prefetch_passes_large_items():
+    assert list(prefetch([b"x" * 100, b"y"], max_items=2, max_bytes=10)) == [
+        b"x" * 100,
+        b"y",
+    ]
+
+
+def test_prefetch_reraises_errors():
+    def items():
+        yield b"a"
+        raise ValueError("download failed")
+
+    iterator = prefetch(items(), max_items=2)
+
+    assert next(iterator) == b"a"
+    with pytest.raises(ValueError, match="download failed"):
+        next(iterator)
+
+
+def test_prefetch_closes_items():
+    closed = threading.Event()
+
+    def items():
+        try:
+            while True:
+                yield b"a"
+        finally:
+            closed.set()
+
+    iterator = prefetch(items(), max_items=2)
+    next(iterator)
+    iterator.close()
+
+    assert closed.wait(timeout=1)
@@ -12,14 +12,16 @@ from sentinelhub import (
     UtmZoneSplitter,
     bbox_to_dimensions,
 )
+from shapely.geometry import box
 
+from src._types import BoundingBox, HeightWidth, TimeRange
+from src.cache import DiskCache, TieredCache
 from src.config import SH_CONFIG
 from src.download.evalscripts import L2A_12_BANDS_SCL
 from src.download.sh import (
     SentinelHubDownload,
     SentinelHubDownloadParams,
 )
-from src._types import BoundingBox, HeightWidth, TimeRange
 
 TIME_INTERVAL = TimeRange("2023-11-01", "2024-01-01")
 
@@ -174,6 +176,110 @@ def test_download_images(
         assert isinstance(images[0].request_timestamp, datetime.datetime)
 
 
+@patch("src.download.sh.SentinelHubCatalog.search")
+def test_download_images_excludes_scenes(
+    mock_search,
+    sh_download_params: SentinelHubDownloadParams,
+    catalog_search,
+):
+    mock_search.return_value = [catalog_search]
+    seen = []
+
+    def exclude_scenes(scenes):
+        seen.extend(scenes)
+        return {scenes[0]}
+
+    sh_download = SentinelHubDownload(sh_download_params, exclude_scenes=exclude_scenes)
+    with patch("src.download.sh.SentinelHubRequest.get_data") as mock_get_data:
+        mock_response = MagicMock()
+        mock_response.content = b"test content"
+        mock_response.headers = {"Date": "Mon, 01 Jan 2000 00:00:00 GMT"}
+        mock_get_data.return_value = [mock_response]
+
+        images = list(sh_download.download_images())
+
+    assert len(seen) == 2
+    assert seen[0].image_id == catalog_search["id"]
+    assert seen[0].bbox == (264000.0, 1612800.0, 268800.0, 1617600.0)
+    assert mock_get_data.call_count == 1
+    assert len(images) == 1
+    assert images[0].bbox == seen[1].bbox
+    assert images[0].timestamp == seen[1].timestamp
+
+
+@patch("src.download.sh.SentinelHubCatalog.search")
+def test_download_images_cached(
+    mock_search,
+    sh_download_params: SentinelHubDownloadParams,
+    catalog_search,
+    tmp_path,
+):
+    mock_search.return_value = [catalog_search]
+    cache = TieredCache(disk_cache=DiskCache(str(tmp_path)))
+    sh_download = SentinelHubDownload(sh_download_params, cache=cache)
+    with patch("src.download.sh.SentinelHubRequest.get_data") as mock_get_data:
+        mock_response = MagicMock()
+        mock_response.content = b"test content"
+        mock_response.headers = {"Date": "Mon, 01 Jan 2000 00:00:00 GMT"}
+        mock_get_data.return_value = [mock_response]
+
+        downloaded = list(sh_download.download_images())
+        cached = list(sh_download.download_images())
+
+    assert mock_get_data.call_count == 2
+    assert cache.stats.misses == 2
+    assert cache.stats.disk_hits == 2
+    assert cached == downloaded
+
+
+@patch("src.download.sh.SentinelHubCatalog.search")
+def test_download_images_skips_tiles_outside_geometry(
+    mock_search,
+    sh_download_params: SentinelHubDownloadParams,
+    catalog_search,
+):
+    mock_search.return_value = [catalog_search]
+    # only reaches into the southern of the two tiles of the bbox
+    sh_download_params.geometry = box(120.8249, 14.6197, 120.8255, 14.6205)
+    sh_download = SentinelHubDownload(sh_download_params)
+    with patch("src.download.sh.SentinelHubRequest.get_data") as mock_get_data:
+        mock_response = MagicMock()
+        mock_response.content = b"test content"
+        mock_response.headers = {"Date": "Mon, 01 Jan 2000 00:00:00 GMT"}
+        mock_get_data.return_value = [mock_response]
+
+        images = list(sh_download.download_images())
+
+    assert mock_search.call_count == 1
+    assert len(images) == 1
+    assert images[0].bbox == (264000.0, 1612800.0, 268800.0, 1617600.0)
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+@patch("src.download.sh.SentinelHubCatalog.search")
+def test_download_images_parallel(
+    mock_search,
+    sh_download_params: SentinelHubDownloadParams,
+    catalog_search,
+    max_workers,
+):
+    # the AOI splits into two bboxes, each with the same five scenes
+    scenes = [{**catalog_search, "id": f"scene_{i}"} for i in range(5)]
+    mock_search.return_value = scenes
+    sh_download = SentinelHubDownload(sh_download_params, max_workers=max_workers)
+    with patch("src.download.sh.SentinelHubRequest.get_data") as mock_get_data:
+        mock_response = MagicMock()
+        mock_response.content = b"test content"
+        mock_response.headers = {"Date": "Mon, 01 Jan 2000 00:00:00 GMT"}
+        mock_get_data.return_value = [mock_response]
+
+        images = list(sh_download.download_images())
+
+    assert mock_get_data.call_count == 10
+    assert [image.image_id for image in images] == [s["id"] for s in scenes] * 2
+    assert images[0].bbox != images[5].bbox
+
+
 @pytest.mark.integration
 def test_search_images_integration(sh_download: SentinelHubDownload, bbox_utm: BBox):
     images = sh_download._search_images(bbox=bbox_utm)
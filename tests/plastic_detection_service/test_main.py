@@ -0,0 +1,29 @@
+import pytest
+
+from src.plastic_detection_service.main import process_scenes
+
+
+def test_process_scenes_inserts_after_next_scene():
+    events = []
+
+    def process(scene):
+        events.append(f"process {scene}")
+        return lambda: events.append(f"insert {scene}")
+
+    process_scenes(["a", "b"], process)
+
+    assert events == ["process a", "process b", "insert a", "insert b"]
+
+
+def test_process_scenes_inserts_previous_scene_when_next_fails():
+    inserted = []
+
+    def process(scene):
+        if scene == "b":
+            raise RuntimeError("inference failed")
+        return lambda: inserted.append(scene)
+
+    with pytest.raises(RuntimeError, match="inference failed"):
+        process_scenes(["a", "b", "c"], process)
+
+    assert inserted == ["a"]
@@ -1,8 +1,14 @@
 import io
 
+import numpy as np
+import pytest
 import rasterio
 
-from src.raster_op.band import RasterioRasterBandSelect, RasterioRemoveBand
+from src.raster_op.band import (
+    RasterioRasterBandSelect,
+    RasterioRemoveBand,
+    without_band,
+)
 
 
 def test_remove_band(s2_l2a_raster, caplog):
@@ -21,6 +27,23 @@ def test_remove_band(s2_l2a_raster, caplog):
         assert image.shape[0] == len(s2_l2a_raster.bands) - 1
 
 
+@pytest.mark.parametrize("band", [1, 5, 12])
+def test_remove_band_keeps_other_bands(s2_l2a_raster, band):
+    image = s2_l2a_raster.to_numpy()
+
+    removed = next(RasterioRemoveBand(band=band).execute([s2_l2a_raster])).to_numpy()
+
+    assert np.array_equal(removed, np.delete(image, band - 1, axis=0))
+    # the first and last band are dropped without copying the image
+    assert np.shares_memory(removed, image) == (band in (1, 12))
+
+
+def test_without_band():
+    assert without_band(3, 3) == slice(0, 2)
+    assert without_band(3, 1) == slice(1, 3)
+    assert without_band(3, 2) == [0, 2]
+
+
 def test_remove_band_skips_nonexistent_band(s2_l2a_raster, caplog):
     remove_band_strategy = RasterioRemoveBand(band=13)
     removed_band_raster = next(remove_band_strategy.execute([s2_l2a_raster]))
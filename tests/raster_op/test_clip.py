@@ -1,3 +1,6 @@
+import pytest
+from shapely.affinity import translate
+
 from src.raster_op.clip import RasterioClip
 
 
@@ -16,3 +19,12 @@ def test_clip_raster(raster):
     assert clipped.bands == raster.bands
     assert clipped.dtype == raster.dtype
     assert clipped.padding_size == raster.padding_size
+    assert clipped.geometry.bounds == clipped.bounds
+    assert raster.geometry.contains(clipped.geometry)
+
+
+def test_clip_raster_without_overlap(raster):
+    outside = translate(raster.geometry, xoff=1e6)
+
+    with pytest.raises(ValueError, match="do not overlap"):
+        next(RasterioClip(geometry=outside, crop=True).execute([raster]))
@@ -4,9 +4,7 @@ import numpy as np
 import rasterio
 
 from src.models import Raster
-from src.raster_op.utils import (
-    create_raster,
-)
+from src.raster_op.utils import create_raster, to_cog, write_cog
 
 
 def test__create_raster(raster):
@@ -35,3 +33,25 @@ def test__create_raster(raster):
         assert new_raster.resolution == src.res[0]
         assert new_raster.dtype == meta["dtype"]
         assert new_raster.padding_size == raster.padding_size
+
+
+def test_write_cog(raster):
+    content = write_cog(raster.to_numpy(), raster.meta, blocksize=256)
+
+    with rasterio.open(io.BytesIO(content)) as src:
+        assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+        assert src.profile["tiled"]
+        assert src.block_shapes[0] == (256, 256)
+        assert src.compression.value == "ZSTD"
+        assert src.overviews(1)
+        assert src.transform == raster.transform
+        assert np.array_equal(src.read(), raster.to_numpy())
+
+
+def test_to_cog(raster):
+    content = to_cog(raster.content, compress="DEFLATE")
+
+    with rasterio.open(io.BytesIO(content)) as src:
+        assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+        assert src.compression.value == "DEFLATE"
+        assert np.array_equal(src.read(), raster.to_numpy())
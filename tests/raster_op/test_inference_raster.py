@@ -1,15 +1,28 @@
+import fiona
 import numpy as np
 import pytest
+from shapely.geometry import box, mapping
 
 from src._types import HeightWidth
+from src.geo_utils import reproject_geometry
 from src.inference.inference_callback import (
     RunpodInferenceCallback,
 )
 from src.models import Raster
 from src.raster_op.band import RasterioRemoveBand
-from src.raster_op.inference import RasterioInference
+from src.raster_op.composite import CompositeRasterOperation
+from src.raster_op.inference import (
+    RasterioInference,
+    RasterioTiledInference,
+    batched,
+    predict,
+)
+from src.raster_op.merge import RasterioRasterMerge
 from src.raster_op.padding import RasterioRasterPad, RasterioRasterUnpad
 from src.raster_op.split import RasterioRasterSplit
+from src.raster_op.utils import create_raster
+from src.raster_op.water_mask import WaterMask, _split_by_grid, load_water_mask
+from src.scl_service.types import SCL
 from tests.conftest import LocalInferenceCallback, MockInferenceCallback
 
 
@@ -31,6 +44,167 @@ def test_inference_raster_mock(s2_l2a_raster):
     assert isinstance(result.content, bytes)
 
 
+def test_tiled_inference_matches_composite(s2_l2a_raster):
+    comp_op = CompositeRasterOperation()
+    comp_op.add(RasterioRasterSplit(image_size=HeightWidth(480, 480), offset=64))
+    comp_op.add(RasterioRasterPad(padding=64))
+    comp_op.add(
+        RasterioInference(
+            inference_func=MockInferenceCallback(), output_dtype="float32"
+        )
+    )
+    comp_op.add(RasterioRasterUnpad())
+    comp_op.add(RasterioRasterMerge())
+    expected = next(comp_op.execute([s2_l2a_raster]))
+
+    result = next(
+        RasterioTiledInference(
+            inference_func=MockInferenceCallback(),
+            output_dtype="float32",
+            image_size=HeightWidth(480, 480),
+            offset=64,
+            padding=64,
+        ).execute([s2_l2a_raster])
+    )
+
+    assert result.dtype == "float32"
+    assert result.bands == [1]
+    assert result.crs == expected.crs
+    assert result.transform == expected.transform
+    assert result.geometry == expected.geometry
+    assert result.padding_size == (0, 0)
+    assert np.array_equal(result.to_numpy(), expected.to_numpy())
+
+
+class BatchRecordingCallback(MockInferenceCallback):
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, payload):
+        self.batch_sizes.append(1)
+        return super().__call__(payload)
+
+    def batch(self, payloads):
+        self.batch_sizes.append(len(payloads))
+        return [super(BatchRecordingCallback, self).__call__(p) for p in payloads]
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([b"aa", b"bbb", b"c", b"dddd"], 10, max_batch_bytes=4)) == [
+        [b"aa"],
+        [b"bbb", b"c"],
+        [b"dddd"],
+    ]
+
+
+def test_predict_encodes_each_payload_once():
+    encoded = []
+
+    def payload(item):
+        encoded.append(item)
+        return item.encode()
+
+    result = list(
+        predict(
+            lambda payload: payload.upper(),
+            ["a", "bb", "c"],
+            payload,
+            batch_size=2,
+            max_batch_bytes=3,
+        )
+    )
+
+    assert result == [("a", b"A"), ("bb", b"BB"), ("c", b"C")]
+    assert encoded == ["a", "bb", "c"]
+
+
+class SlowFirstCallback:
+    """Holds back the prediction of the first item until no more payloads
+    are fed, like a concurrent callback whose first request is slow."""
+
+    max_concurrency = 2
+
+    def imap_unordered(self, payloads):
+        held = []
+        for index, payload in enumerate(payloads):
+            if payload == b"0":
+                held.append((index, payload))
+            else:
+                yield index, payload
+        yield from held
+
+
+def test_predict_bounds_buffer_behind_slow_item():
+    pulled = []
+    yielded = []
+    buffered = []
+
+    def items():
+        for item in range(20):
+            pulled.append(item)
+            yield item
+
+    for item, prediction in predict(
+        SlowFirstCallback(), items(), lambda item: str(item).encode()
+    ):
+        buffered.append(len(pulled) - len(yielded))
+        yielded.append(item)
+        assert prediction == str(item).encode()
+
+    assert yielded == list(range(20))
+    # the slow item and at most ``max_concurrency`` predictions behind it
+    assert max(buffered) == 3
+
+
+def test_inference_raster_batched(s2_l2a_raster):
+    tiles = list(
+        RasterioRasterSplit(image_size=HeightWidth(240, 240), offset=32).execute(
+            [s2_l2a_raster]
+        )
+    )
+    expected = list(
+        RasterioInference(
+            inference_func=MockInferenceCallback(), output_dtype="float32"
+        ).execute(tiles)
+    )
+
+    callback = BatchRecordingCallback()
+    result = list(
+        RasterioInference(
+            inference_func=callback, output_dtype="float32", batch_size=4
+        ).execute(tiles)
+    )
+
+    assert sum(callback.batch_sizes) == len(tiles)
+    assert callback.batch_sizes[:-1] == [4] * (len(callback.batch_sizes) - 1)
+    assert len(result) == len(expected)
+    for res, exp in zip(result, expected, strict=True):
+        assert res.transform == exp.transform
+        assert np.array_equal(res.to_numpy(), exp.to_numpy())
+
+    callback = BatchRecordingCallback()
+    tiled = RasterioTiledInference(
+        inference_func=callback,
+        output_dtype="float32",
+        image_size=HeightWidth(240, 240),
+        offset=32,
+        batch_size=5,
+    )
+    expected_mosaic = RasterioTiledInference(
+        inference_func=MockInferenceCallback(),
+        output_dtype="float32",
+        image_size=HeightWidth(240, 240),
+        offset=32,
+    )
+    assert np.array_equal(
+        next(tiled.execute([s2_l2a_raster])).to_numpy(),
+        next(expected_mosaic.execute([s2_l2a_raster])).to_numpy(),
+    )
+    assert sum(callback.batch_sizes) == len(tiles)
+    assert max(callback.batch_sizes) == 5
+
+
 @pytest.mark.slow
 def test_inference_raster_real(s2_l2a_raster, pred_durban_first_split_raster):
     raster = RasterioRasterSplit(image_size=HeightWidth(480, 480), offset=64).execute(
@@ -82,3 +256,132 @@ def test_inference_raster_real_runpod(s2_l2a_raster, pred_durban_first_split_ras
 
     assert inference_raster.size == pred_durban_first_split_raster.size
     assert inference_raster.crs == pred_durban_first_split_raster.crs
+
+
+def test_tiled_inference_skips_land_tiles(s2_l2a_raster):
+    minx, miny, maxx, maxy = s2_l2a_raster.bounds
+    _, height, width = s2_l2a_raster.to_numpy().shape
+    # water covers the left third of the scene
+    water = reproject_geometry(
+        box(minx, miny, minx + (maxx - minx) / 3, maxy), s2_l2a_raster.crs, 4326
+    )
+    kwargs = {
+        "output_dtype": "float32",
+        "image_size": HeightWidth(120, 120),
+        "offset": 16,
+    }
+    expected = next(
+        RasterioTiledInference(
+            inference_func=MockInferenceCallback(), **kwargs
+        ).execute([s2_l2a_raster])
+    ).to_numpy()
+
+    callback = BatchRecordingCallback()
+    result = next(
+        RasterioTiledInference(
+            inference_func=callback, water_mask=WaterMask([water]), **kwargs
+        ).execute([s2_l2a_raster])
+    ).to_numpy()
+
+    tiles = len(
+        list(RasterioRasterSplit(HeightWidth(120, 120), 16).execute([s2_l2a_raster]))
+    )
+    assert 0 < sum(callback.batch_sizes) < tiles
+    assert np.array_equal(result[:, :, : width // 3], expected[:, :, : width // 3])
+    assert not result[:, :, width // 2 :].any()
+
+
+def test_water_mask_rasterize(s2_l2a_raster):
+    minx, miny, maxx, maxy = s2_l2a_raster.bounds
+    water = reproject_geometry(
+        box(minx, miny, (minx + maxx) / 2, maxy), s2_l2a_raster.crs, 4326
+    )
+    _, height, width = s2_l2a_raster.to_numpy().shape
+
+    mask = WaterMask([water]).rasterize(s2_l2a_raster)
+    buffered = WaterMask([water]).rasterize(s2_l2a_raster, buffer=100)
+    far_away = WaterMask([box(0, 0, 1, 1)]).rasterize(s2_l2a_raster)
+
+    assert mask.shape == (height, width)
+    assert mask[:, : width // 2 - 1].all()
+    assert not mask[:, width // 2 + 1 :].any()
+    assert buffered.sum() > mask.sum()
+    assert not far_away.any()
+
+
+def test_tiled_inference_skips_cloudy_tiles(s2_l2a_raster):
+    image = s2_l2a_raster.to_numpy()
+    _, height, width = image.shape
+    # the left half of the scene is clouded
+    scl = np.full((1, height, width), SCL.WATER.value, dtype=image.dtype)
+    scl[:, :, : width // 2] = SCL.CLOUD_HIGH_PROB.value
+    meta = s2_l2a_raster.meta
+    meta["count"] = image.shape[0] + 1
+    raster = create_raster(
+        None,
+        np.concatenate([image, scl]),
+        s2_l2a_raster.bounds,
+        meta,
+        HeightWidth(0, 0),
+    )
+    kwargs = {
+        "output_dtype": "float32",
+        "image_size": HeightWidth(120, 120),
+        "offset": 16,
+    }
+    expected = next(
+        RasterioTiledInference(
+            inference_func=MockInferenceCallback(), **kwargs
+        ).execute([s2_l2a_raster])
+    ).to_numpy()
+
+    callback = BatchRecordingCallback()
+    result = next(
+        RasterioTiledInference(
+            inference_func=callback, scl_band=raster.meta["count"], **kwargs
+        ).execute([raster])
+    ).to_numpy()
+
+    tiles = len(
+        list(RasterioRasterSplit(HeightWidth(120, 120), 16).execute([s2_l2a_raster]))
+    )
+    assert 0 < sum(callback.batch_sizes) < tiles
+    assert result.shape == expected.shape
+    assert not result[:, :, : width // 3].any()
+    assert np.array_equal(
+        result[:, :, 2 * width // 3 :], expected[:, :, 2 * width // 3 :]
+    )
+
+
+def test_split_by_grid():
+    # spans two 10 degree cells in x
+    pieces = _split_by_grid([box(5, 1, 15, 2), box(-179, -89, -178, -88)], 10)
+
+    assert sorted(piece.bounds for piece in pieces) == [
+        (-179.0, -89.0, -178.0, -88.0),
+        (5.0, 1.0, 10.0, 2.0),
+        (10.0, 1.0, 15.0, 2.0),
+    ]
+
+
+def test_load_water_mask(tmp_path, s2_l2a_raster):
+    minx, miny, maxx, maxy = s2_l2a_raster.bounds
+    water = reproject_geometry(
+        box(minx, miny, (minx + maxx) / 2, maxy), s2_l2a_raster.crs, 4326
+    )
+    path = str(tmp_path / "water.shp")
+    with fiona.open(
+        path,
+        "w",
+        driver="ESRI Shapefile",
+        crs="EPSG:4326",
+        schema={"geometry": "Polygon", "properties": {}},
+    ) as dst:
+        dst.write({"geometry": mapping(water), "properties": {}})
+
+    mask = load_water_mask(path)
+
+    assert load_water_mask(path) is mask
+    assert np.array_equal(
+        mask.rasterize(s2_l2a_raster), WaterMask([water]).rasterize(s2_l2a_raster)
+    )
@@ -3,11 +3,14 @@ import io
 import numpy as np
 import pytest
 import rasterio
+from rasterio.merge import MERGE_METHODS
 
 from src._types import HeightWidth
 from src.raster_op.merge import (
+    FEATHER,
     RasterioRasterMerge,
     copy_smooth,
+    feather_window,
     smooth_overlap_callable,
 )
 from src.raster_op.split import (
@@ -16,7 +19,7 @@ from src.raster_op.split import (
 
 
 @pytest.mark.parametrize(
-    "merge_method", ["first", smooth_overlap_callable, copy_smooth]
+    "merge_method", ["first", FEATHER, smooth_overlap_callable, copy_smooth]
 )
 def test_merge_rasters(s2_l2a_raster, merge_method):
     merge_strategy = RasterioRasterMerge(offset=64, merge_method=merge_method)
@@ -59,3 +62,48 @@ def test_merge_rasters(s2_l2a_raster, merge_method):
     assert merged.bands == s2_l2a_raster.bands
     assert merged.padding_size == (0, 0)
     assert merged.geometry == s2_l2a_raster.geometry
+
+
+def test_merge_streaming_with_known_bounds(s2_l2a_raster):
+    split_strategy = RasterioRasterSplit(image_size=HeightWidth(480, 480), offset=64)
+    expected = next(
+        RasterioRasterMerge().execute(split_strategy.execute([s2_l2a_raster]))
+    )
+
+    consumed = []
+    consumed_at_merge = []
+
+    def tiles():
+        for tile in split_strategy.execute([s2_l2a_raster]):
+            consumed.append(tile)
+            yield tile
+
+    def copy_first(*args, **kwargs):
+        consumed_at_merge.append(len(consumed))
+        MERGE_METHODS["first"](*args, **kwargs)
+
+    merge_strategy = RasterioRasterMerge(
+        merge_method=copy_first, bounds=s2_l2a_raster.bounds
+    )
+    merged = next(merge_strategy.execute(tiles()))
+
+    # every tile is merged before the next one is pulled
+    assert consumed_at_merge == [1, 2, 3, 4]
+    assert merged.transform == expected.transform
+    assert merged.geometry == s2_l2a_raster.geometry
+    assert np.array_equal(merged.to_numpy(), expected.to_numpy())
+
+    merged_again = next(merge_strategy.execute(split_strategy.execute([s2_l2a_raster])))
+    assert merged_again.content == merged.content
+
+
+def test_feather_window():
+    window = feather_window(100, 80, 16)
+
+    assert window.shape == (100, 80)
+    assert window.dtype == np.float32
+    assert np.all(window > 0)
+    assert np.all(window[16:-16, 16:-16] == 1)
+    assert np.allclose(window, window[::-1, ::-1])
+    assert feather_window(100, 80, 16) is window
+    assert not window.flags.writeable
@@ -1,3 +1,5 @@
+import numpy as np
+from pyproj import Transformer
 from shapely.geometry import Point, Polygon
 
 from src.models import Raster
@@ -22,6 +24,33 @@ def test_to_point(raster: Raster):
         assert vec.geometry.bounds[3] <= raster.geometry.bounds[3]
 
 
+def test_to_point_threshold(raster: Raster):
+    image = raster.to_numpy()[0]
+    threshold = int(np.median(image))
+    expected = [
+        (int(value), raster.transform * (col + 0.5, row + 0.5))
+        for (row, col), value in np.ndenumerate(image)
+        if value > threshold
+    ]
+
+    vectors = list(RasterioRasterToPoint(threshold=threshold).execute(raster))
+
+    assert len(vectors) == len(expected)
+    for vec, (value, (x, y)) in zip(vectors, expected, strict=True):
+        assert vec.pixel_value == value
+        assert (vec.geometry.x, vec.geometry.y) == (x, y)
+
+
+def test_to_point_batch(raster: Raster):
+    strategy = RasterioRasterToPoint(threshold=int(np.median(raster.to_numpy()[0])))
+
+    batch = strategy.execute_batch(raster)
+
+    assert batch.is_points
+    assert batch.crs == raster.crs
+    assert list(batch) == list(strategy.execute(raster))
+
+
 def test_to_polygon(raster: Raster):
     strategy = RasterioRasterToPolygon(band=1)
     vectors = strategy.execute(
@@ -38,3 +67,20 @@ def test_to_polygon(raster: Raster):
         assert vec.geometry.bounds[1] >= raster.geometry.bounds[1]
         assert vec.geometry.bounds[2] <= raster.geometry.bounds[2]
         assert vec.geometry.bounds[3] <= raster.geometry.bounds[3]
+
+
+def test_to_point_target_crs(raster: Raster):
+    strategy = RasterioRasterToPoint(threshold=int(np.median(raster.to_numpy()[0])))
+
+    native = strategy.execute_batch(raster)
+    strategy.target_crs = 4326
+    transformed = strategy.execute_batch(raster)
+
+    assert transformed.crs == 4326
+    assert list(transformed.pixel_values) == list(native.pixel_values)
+    xs, ys = np.array([(vec.geometry.x, vec.geometry.y) for vec in native]).T
+    expected_xs, expected_ys = Transformer.from_crs(
+        raster.crs, 4326, always_xy=True
+    ).transform(xs, ys)
+    assert np.allclose([vec.geometry.x for vec in transformed], expected_xs)
+    assert np.allclose([vec.geometry.y for vec in transformed], expected_ys)
@@ -1,8 +1,10 @@
 import numpy as np
 import pytest
 
+from src.geo_utils import reproject_geometry
 from src.models import Raster
-from src.raster_op.reproject import RasterioRasterReproject
+from src.raster_op.clip import RasterioClip
+from src.raster_op.reproject import RasterioRasterReproject, RasterioReprojectClip
 
 
 @pytest.mark.parametrize(
@@ -32,3 +34,23 @@ def test_reproject_raster(raster, rasterio_ds, strategy):
     assert reprojected_raster.geometry.bounds[2] < 180
     assert reprojected_raster.geometry.bounds[1] > -90
     assert reprojected_raster.geometry.bounds[3] < 90
+
+
+def test_reproject_clip_raster(raster):
+    aoi = reproject_geometry(raster.geometry.buffer(-1000), raster.crs, 4326)
+    reprojected = next(
+        RasterioRasterReproject(target_crs=4326, target_bands=[1]).execute([raster])
+    )
+    expected = next(RasterioClip(aoi, crop=True).execute([reprojected]))
+
+    clipped = next(
+        RasterioReprojectClip(aoi, target_crs=4326, target_bands=[1]).execute([raster])
+    )
+
+    assert clipped.crs == 4326
+    assert clipped.transform == expected.transform
+    assert clipped.size[0] * clipped.size[1] < reprojected.size[0] * reprojected.size[1]
+    # GDAL's approximate transformer may pick a different neighbour for a
+    # few pixels when only a window is warped
+    assert np.mean(clipped.to_numpy() != expected.to_numpy()) < 0.01
+    assert clipped.geometry.covers(aoi)
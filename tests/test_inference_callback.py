@@ -0,0 +1,211 @@
+import asyncio
+import base64
+import json
+import os
+
+import numpy as np
+
+from src._types import HeightWidth
+from src.cache import CacheStats, DiskCache, TieredCache
+from src.inference.cache import CachedInferenceCallback
+from src.inference.inference_callback import AsyncRunpodInferenceCallback
+from src.raster_op.inference import RasterioInference
+from src.raster_op.split import RasterioRasterSplit
+from tests.conftest import MockInferenceCallback
+
+
+class FakeJob:
+    def __init__(self, endpoint, payload):
+        self.endpoint = endpoint
+        self.payload = payload
+        self.index = len(endpoint.jobs)
+        self.job_id = str(self.index)
+
+    async def output(self, timeout=0):
+        self.endpoint.in_flight += 1
+        self.endpoint.max_in_flight = max(
+            self.endpoint.max_in_flight, self.endpoint.in_flight
+        )
+        # later jobs finish first
+        await asyncio.sleep(0.01 * (10 - self.index % 10))
+        self.endpoint.in_flight -= 1
+        if self.endpoint.fail_first and self.index == 0:
+            return None
+        prediction = MockInferenceCallback()(base64.b64decode(self.payload))
+        return json.dumps({"prediction": base64.b64encode(prediction).decode()})
+
+    async def cancel(self):
+        pass
+
+
+class FakeEndpoint:
+    def __init__(self, fail_first=False):
+        self.jobs = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_first = fail_first
+
+    async def run(self, request_input):
+        job = FakeJob(self, request_input["image"])
+        self.jobs.append(job)
+        return job
+
+
+def _callback(endpoint, **kwargs):
+    callback = AsyncRunpodInferenceCallback(
+        endpoint_url="test", backoff_base=0, **kwargs
+    )
+    callback._endpoint = endpoint  # type: ignore
+    return callback
+
+
+def test_async_callback_matches_sequential(s2_l2a_raster):
+    tiles = list(
+        RasterioRasterSplit(image_size=HeightWidth(240, 240), offset=32).execute(
+            [s2_l2a_raster]
+        )
+    )
+    expected = list(
+        RasterioInference(
+            inference_func=MockInferenceCallback(), output_dtype="float32"
+        ).execute(tiles)
+    )
+
+    endpoint = FakeEndpoint(fail_first=True)
+    callback = _callback(endpoint, max_concurrency=4)
+    try:
+        result = list(
+            RasterioInference(inference_func=callback, output_dtype="float32").execute(
+                tiles
+            )
+        )
+    finally:
+        callback.close()
+
+    assert len(endpoint.jobs) == len(tiles) + 1
+    assert endpoint.max_in_flight == 4
+    assert len(result) == len(expected)
+    for res, exp in zip(result, expected, strict=True):
+        assert res.transform == exp.transform
+        assert np.array_equal(res.to_numpy(), exp.to_numpy())
+
+
+def test_async_callback_unordered(s2_l2a_raster):
+    tiles = list(
+        RasterioRasterSplit(image_size=HeightWidth(240, 240), offset=32).execute(
+            [s2_l2a_raster]
+        )
+    )
+    callback = _callback(FakeEndpoint(), max_concurrency=8)
+    try:
+        indices = [
+            index for index, _ in callback.imap_unordered(t.content for t in tiles)
+        ]
+        result = list(
+            RasterioInference(
+                inference_func=callback, output_dtype="float32", ordered=False
+            ).execute(tiles)
+        )
+    finally:
+        callback.close()
+
+    assert sorted(indices) == list(range(len(tiles)))
+    assert indices != sorted(indices)
+    assert {tuple(r.transform) for r in result} == {tuple(t.transform) for t in tiles}
+
+
+class CountingCallback(MockInferenceCallback):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, payload):
+        self.calls += 1
+        return super().__call__(payload)
+
+
+def test_cached_callback(tmp_path, s2_l2a_raster):
+    tiles = list(
+        RasterioRasterSplit(image_size=HeightWidth(240, 240), offset=32).execute(
+            [s2_l2a_raster]
+        )
+    )
+    payloads = [tile.content for tile in tiles]
+    inner = CountingCallback()
+    callback = CachedInferenceCallback(
+        inner,
+        model_id="model",
+        model_version=1,
+        cache=TieredCache(DiskCache(str(tmp_path))),
+    )
+
+    first = dict(callback.imap_unordered(payloads))
+    assert inner.calls == len(payloads)
+    assert callback.stats == CacheStats(misses=len(payloads))
+
+    second = dict(callback.imap_unordered(payloads))
+    assert inner.calls == len(payloads)
+    assert callback.stats.disk_hits == len(payloads)
+    assert first == second
+    assert callback.batch(payloads[:3]) == [first[i] for i in range(3)]
+
+    other_version = CachedInferenceCallback(
+        inner,
+        model_id="model",
+        model_version=2,
+        cache=TieredCache(DiskCache(str(tmp_path))),
+    )
+    other_version(payloads[0])
+    assert inner.calls == len(payloads) + 1
+    assert other_version.stats.misses == 1
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=25)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    os.utime(tmp_path / "a", (0, 0))
+    os.utime(tmp_path / "b", (1, 1))
+    assert cache.get("a") == b"a" * 10
+
+    cache.put("c", b"c" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a" * 10
+    assert cache.get("c") == b"c" * 10
+
+
+def test_cached_callback_yields_hits_as_found(tmp_path):
+    inner = CountingCallback()
+    callback = CachedInferenceCallback(
+        inner,
+        model_id="model",
+        model_version=1,
+        cache=TieredCache(DiskCache(str(tmp_path))),
+    )
+    for payload in (b"a", b"b"):
+        callback.cache.put(callback.key(payload), payload.upper())
+    pulled = []
+
+    def payloads():
+        for payload in (b"a", b"b"):
+            pulled.append(payload)
+            yield payload
+
+    results = callback.imap_unordered(payloads())
+
+    assert next(results) == (0, b"A")
+    assert pulled == [b"a"]
+    assert list(results) == [(1, b"B")]
+    assert inner.calls == 0
+
+
+def test_disk_cache_get_tolerates_concurrent_eviction(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path))
+    cache.put("a", b"a")
+
+    def evicted(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+
+    assert cache.get("a") == b"a"
@@ -1,8 +1,14 @@
+import io
 import os
 
+import numpy as np
+import pytest
 import rasterio
+import shapely
+from shapely.geometry import Point, Polygon
 
-from src.models import Raster
+from src.geo_utils import reproject_geometry
+from src.models import Raster, Vector, VectorBatch
 
 
 def test_raster_to_numpy(raster: Raster):
@@ -37,3 +43,78 @@ def test_vector_geojson(vector):
     assert geojson["type"] == "Feature"
     assert geojson["geometry"] == vector.geometry.__geo_interface__
     assert geojson["properties"]["pixel_value"] == vector.pixel_value
+
+
+def test_raster_from_array_encodes_content_lazily(raster: Raster):
+    array_raster = Raster(
+        content=None,  # type: ignore
+        size=raster.size,
+        dtype=raster.dtype,
+        crs=raster.crs,
+        bands=raster.bands,
+        resolution=raster.resolution,
+        geometry=raster.geometry,
+        array=raster.to_numpy(),
+        transform=raster.transform,
+    )
+    assert array_raster.__dict__["_content"] is None
+
+    with rasterio.open(io.BytesIO(array_raster.content)) as src:
+        assert src.crs.to_epsg() == raster.crs
+        assert src.transform == raster.transform
+        assert (src.read() == raster.to_numpy()).all()
+
+
+def test_raster_needs_content_or_array(raster: Raster):
+    with pytest.raises(ValueError):
+        Raster(
+            content=None,  # type: ignore
+            size=raster.size,
+            dtype=raster.dtype,
+            crs=raster.crs,
+            bands=raster.bands,
+            resolution=raster.resolution,
+            geometry=raster.geometry,
+        )
+
+
+def test_vector_batch_points():
+    batch = VectorBatch.from_points(
+        np.array([10.0, 20.0, 30.0]),
+        np.array([50.0, 51.0, 52.0]),
+        np.array([1, 5, 9]),
+        crs=4326,
+    )
+
+    filtered = batch.filter(batch.pixel_values > 2)
+    assert len(filtered) == 2
+    assert [v.pixel_value for v in filtered] == [5, 9]
+    assert [v.geometry for v in filtered] == [Point(20, 51), Point(30, 52)]
+
+    reprojected = batch.to_crs(3857)
+    for vector, expected in zip(reprojected, batch, strict=True):
+        assert vector.geometry.equals_exact(
+            reproject_geometry(expected.geometry, 4326, 3857), 1e-6
+        )
+    assert reprojected.to_crs(4326).x == pytest.approx(batch.x)
+
+    ewkb = batch.to_wkb(include_srid=True)
+    assert shapely.get_srid(shapely.from_wkb(ewkb)).tolist() == [4326] * 3
+    assert batch.to_wkb(include_srid=True, hex=True).tolist() == [
+        shapely.to_wkb(shapely.set_srid(Point(x, y), 4326), hex=True, include_srid=True)
+        for x, y in zip(batch.x, batch.y, strict=True)  # type: ignore
+    ]
+
+    features = batch.geojson["features"]
+    assert features[0]["geometry"] == Point(10, 50).__geo_interface__
+    assert features[0]["properties"]["pixel_value"] == 1
+
+
+def test_vector_batch_from_vectors(vector):
+    polygon = Polygon([(0, 0), (1, 0), (1, 1), (0, 1)])
+    vectors = [vector, Vector(geometry=polygon, crs=vector.crs, pixel_value=7)]
+    batch = VectorBatch.from_vectors(vectors, crs=vector.crs)
+
+    assert not batch.is_points
+    assert list(batch) == vectors
+    assert len(VectorBatch.concat([batch, batch])) == 4
@@ -1,7 +1,7 @@
 import pytest
 from shapely.geometry import Polygon
 
-from src.models import Vector
+from src.models import Vector, VectorBatch
 from src.vector_op import (
     VectorFilter,
     pixelvalue_to_probability,
@@ -33,6 +33,14 @@ def test_filter_out_(vectors: list[Vector]):
     assert filtered[0] == vectors[1]
 
 
+def test_filter_batch(vectors: list[Vector]):
+    batch = VectorBatch.from_vectors(vectors, crs=4326)
+
+    filtered = VectorFilter(threshold=10).execute_batch(batch)
+
+    assert list(filtered) == [vectors[1], vectors[2]]
+
+
 def test_probability_to_pixelvalue():
     assert probability_to_pixelvalue(0.5) == 128
     assert probability_to_pixelvalue(0.1) == 26